@@ -12,6 +12,11 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_wtf.csrf import CSRFProtect
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.cache import ResponseCache, register_invalidation
+from app.instrumentation import SQLInstrumentation
+from app.email import MailQueue
+from app.ratelimit import RateLimiter
 from config import Config
 
 db = SQLAlchemy()
@@ -21,18 +26,33 @@ login.login_view = 'auth.login'
 #scss = Scss()
 csrf = CSRFProtect()
 mail = Mail()
+mail_queue = MailQueue()
+rate_limiter = RateLimiter()
 my_admin = Admin(name='MTG Stats Admin')
+_admin_views_registered = False  # my_admin keeps its views across create_app() calls
+response_cache = ResponseCache()
+register_invalidation(response_cache)
+sql_instrumentation = SQLInstrumentation()
 
 # My App
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    if app.config.get('PROXY_FIX_HOPS'):
+        # Behind N trusted reverse proxies: take the client address and scheme from
+        # X-Forwarded-For/-Proto, so the per-IP rate limits key on real clients
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
     db.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
     mail.init_app(app)
+    mail_queue.init_app(app)
+    rate_limiter.init_app(app)
     csrf.init_app(app)
     my_admin.init_app(app)
+    response_cache.init_app(app)
+    sql_instrumentation.init_app(app)
     from app.errors import bp as errors_bp
     app.register_blueprint(errors_bp)
 
@@ -41,12 +61,21 @@ def create_app(config_class=Config):
 
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
+
+    from app.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)
     # Lazy import Admin views AFTER blueprints/models are ready
     def register_admin_views():
+        # Views live on the module-level Admin; init_app above already attached them
+        # to this app if an earlier create_app() call added them
+        global _admin_views_registered
+        if _admin_views_registered:
+            return
         try:
             from app.models import (User, Player, Deck, GameSession, GameResult, ColorIdentity, DeckColor)
             from app.admin import (SecureModelView, UserAdmin, PlayerAdmin, DeckAdmin, 
-                                GameSessionAdmin, GameResultAdmin, ColorIdentityAdmin,MyAdminIndexView,DeckColorAdmin)
+                                GameSessionAdmin, GameResultAdmin, ColorIdentityAdmin,MyAdminIndexView,DeckColorAdmin,
+                                GameImportView, GameExportView)
             from flask_admin import AdminIndexView
             
             my_admin.add_link(MenuLink(
@@ -62,6 +91,9 @@ def create_app(config_class=Config):
             my_admin.add_view(GameResultAdmin(GameResult, db.session))
             my_admin.add_view(ColorIdentityAdmin(ColorIdentity, db.session))
             my_admin.add_view(DeckColorAdmin(DeckColor, db.session))
+            my_admin.add_view(GameImportView(name='Import Games', endpoint='game_import'))
+            my_admin.add_view(GameExportView(name='Export Games', endpoint='game_export'))
+            _admin_views_registered = True
 
             #print("✅ Admin views registered successfully")
             
@@ -1,19 +1,32 @@
 # app/admin.py
-from flask import redirect, url_for, request
+from datetime import date
+from flask import redirect, url_for, request, flash, abort, Response, stream_with_context
 from flask_login import current_user
+from flask_admin import BaseView, expose
 from flask_admin.contrib.sqla import ModelView
-from app.models import (User, Player, Deck, ColorIdentity, GameSession, GameResult, DeckColor)
+from flask_admin.contrib.sqla.filters import IntGreaterFilter, IntSmallerFilter, FloatGreaterFilter, FloatSmallerFilter
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import BooleanField, SubmitField
+from app.models import (User, Player, Deck, ColorIdentity, GameSession, GameResult, DeckColor,
+                        PlayerStats, DeckStats)
 from flask_admin import AdminIndexView
 from flask_admin.menu import MenuLink
 from sqlalchemy import func
+import sqlalchemy as sa
+import sqlalchemy.orm as so
 
-class SecureModelView(ModelView):
+class AdminAccessMixin:
+    """Admin-only access for model and custom views; everyone else is sent to the login page"""
     def is_accessible(self):
         return (current_user.is_authenticated and current_user.is_admin)
     
     def inaccessible_callback(self, name, **kwargs):
         return redirect(url_for('auth.login', next=request.url))
 
+class SecureModelView(AdminAccessMixin, ModelView):
+    pass
+
 class AdminOnlyView(SecureModelView):  # Same as SecureModelView
     pass
 
@@ -40,17 +53,54 @@ class UserAdmin(SecureModelView):
     column_hide_backrefs = True
     column_searchable_list = ['username', 'email']
 
+def _rollup_columns(stats):
+    """Stat columns read from a player_stats/deck_stats row outer-joined to the listed model"""
+    return {
+        'wins': func.coalesce(stats.wins, 0),
+        'total_games': func.coalesce(stats.games, 0),
+        'total_valid_games': func.coalesce(stats.valid_games, 0),
+        'win_rate': func.coalesce(stats.win_rate, 0.0),
+    }
+
+def _rollup_filters(columns):
+    return [
+        IntGreaterFilter(columns['wins'], 'Wins'), IntSmallerFilter(columns['wins'], 'Wins'),
+        IntGreaterFilter(columns['total_games'], 'Games'), IntSmallerFilter(columns['total_games'], 'Games'),
+        FloatGreaterFilter(columns['win_rate'], 'Win Rate'), FloatSmallerFilter(columns['win_rate'], 'Win Rate'),
+    ]
+
+PLAYER_STATS = _rollup_columns(PlayerStats)
+DECK_STATS = _rollup_columns(DeckStats)
+
 class PlayerAdmin(SecureModelView):
     column_list = ['player_name', 'user', 'wins', 'total_games', 'win_rate']
     column_editable_list = ['player_name']
     column_searchable_list = ['player_name']
+    column_sortable_list = ['player_name'] + [(name, PLAYER_STATS[name]) for name in ('wins', 'total_games', 'win_rate')]
+    column_filters = _rollup_filters(PLAYER_STATS)
+    form_excluded_columns = ['_wins', '_total_games', '_total_valid_games']
+
+    # Stats come from the player_stats rollup in the list SELECT, so they sort and filter in SQL
+    def get_query(self):
+        return super().get_query().outerjoin(PlayerStats, PlayerStats.player_id == Player.id).options(
+            so.with_expression(Player._wins, PLAYER_STATS['wins']),
+            so.with_expression(Player._total_games, PLAYER_STATS['total_games']),
+            so.with_expression(Player._total_valid_games, PLAYER_STATS['total_valid_games']),
+            so.selectinload(Player.user)
+        )
+
+    # Stat filters are applied to the count as well
+    def get_count_query(self):
+        return super().get_count_query().outerjoin(PlayerStats, PlayerStats.player_id == Player.id)
 
 class DeckAdmin(SecureModelView):
     column_list = ['deck_name', 'color_identity_code', 'color_identity_rel', 
                    'deck_owner', 'total_games', 'wins', 'win_rate']
-    column_filters = ['color_identity_code', 'color_identity_rel', 'deck_owner']
+    column_filters = ['color_identity_code', 'color_identity_rel', 'deck_owner'] + _rollup_filters(DECK_STATS)
     column_searchable_list = ['deck_name', 'color_identity_code']
     
+    column_sortable_list = ['deck_name', 'color_identity_code'] + \
+        [(name, DECK_STATS[name]) for name in ('total_games', 'wins', 'win_rate')]
     column_default_sort = [('deck_name', True)]  # Database column only
     
     column_labels = {
@@ -77,30 +127,65 @@ class DeckAdmin(SecureModelView):
             model.deck_owner.player_name if model.deck_owner else 'None'
     }
     
-    form_excluded_columns = ['wins', 'win_rate', 'total_games']
+    form_excluded_columns = ['wins', 'win_rate', 'total_games',
+                             '_wins', '_total_games', '_total_valid_games']
+
+    # Stats come from the deck_stats rollup in the list SELECT, so they sort and filter in SQL
+    def get_query(self):
+        return super().get_query().outerjoin(DeckStats, DeckStats.deck_id == Deck.id).options(
+            so.with_expression(Deck._wins, DECK_STATS['wins']),
+            so.with_expression(Deck._total_games, DECK_STATS['total_games']),
+            so.with_expression(Deck._total_valid_games, DECK_STATS['total_valid_games']),
+            so.joinedload(Deck.deck_owner),
+            so.joinedload(Deck.color_identity_rel)
+        )
+
+    def get_count_query(self):
+        return super().get_count_query().outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
 
 class GameSessionAdmin(SecureModelView):
-    column_list = ['game_date', 'gs_wincon', 'results']
+    column_list = ['game_date', 'gs_wincon', 'player_count', 'results']
     column_searchable_list = ['game_date']
+    column_labels = {'player_count': 'Players'}
+    form_excluded_columns = ['player_count']  # Maintained from GameResult writes
+
+    # Each listed result's repr names its player, deck and eliminator
+    def get_query(self):
+        return super().get_query().options(
+            so.selectinload(GameSession.results).options(
+                so.joinedload(GameResult.player),
+                so.joinedload(GameResult.deck),
+                so.joinedload(GameResult.eliminated_by)
+            )
+        )
 
 class GameResultAdmin(SecureModelView):
     column_list = ['gr_session', 'player', 'deck', 'finish', 'eliminated_by']
     column_filters = ['player', 'deck', 'finish', 'gr_session']
+
+    # The deck column's repr names its color identity
+    def get_query(self):
+        return super().get_query().options(so.joinedload(GameResult.deck).joinedload(Deck.color_identity_rel))
     
+DECK_COUNT = (
+    sa.select(func.count(DeckColor.id))
+    .where(DeckColor.color_id == ColorIdentity.code)
+    .correlate(ColorIdentity)
+    .scalar_subquery()
+)
+
 class ColorIdentityAdmin(SecureModelView):
-    column_list = ['code', 'identity_name']
-    column_filters = ['code']
-    
-    # Custom column added via scaffold_list_columns
-    def scaffold_list_columns(self):
-        return ['code', 'identity_name', 'deck_count']
-    
-    column_formatters = {
-        'deck_count': lambda view, ctx, model, name: len(model.deck_colors)
-    }
+    column_list = ['code', 'identity_name', 'deck_count']
+    column_filters = ['code', IntGreaterFilter(DECK_COUNT, 'Total Decks'), IntSmallerFilter(DECK_COUNT, 'Total Decks')]
+    column_sortable_list = ['code', 'identity_name', ('deck_count', DECK_COUNT)]
     column_labels = {
         'deck_count': 'Total Decks'
     }
+    form_excluded_columns = ['deck_count']
+
+    # One indexed count per listed identity instead of loading its deck_colors
+    def get_query(self):
+        return super().get_query().options(so.with_expression(ColorIdentity.deck_count, DECK_COUNT))
 
 class DeckColorAdmin(SecureModelView):
     column_list = ['id', 'deck.deck_name', 'color.identity_name', 'color.code']
@@ -112,3 +197,57 @@ class DeckColorAdmin(SecureModelView):
     column_searchable_list = ['deck.deck_name', 'color.code']
     column_filters = ['color.code', 'deck.deck_name']
     column_sortable_list = ['id']
+
+    def get_query(self):
+        return super().get_query().options(so.joinedload(DeckColor.deck), so.joinedload(DeckColor.color))
+
+
+class GameImportForm(FlaskForm):
+    file = FileField('CSV or XLSX file', validators=[FileRequired(), FileAllowed(['csv', 'xlsx'], 'CSV or XLSX only')])
+    dry_run = BooleanField('Validate only (insert nothing)')
+    submit = SubmitField('Import')
+
+class GameImportView(AdminAccessMixin, BaseView):
+    """Upload a season of games in one file (same pipeline as `flask games import`)"""
+    @expose('/', methods=('GET', 'POST'))
+    def index(self):
+        from app.importer import COLUMNS, ImportAborted, read_rows, import_games
+
+        form = GameImportForm()
+        report = None
+        if form.validate_on_submit():
+            upload = form.file.data
+            try:
+                report = import_games(read_rows(upload.stream, upload.filename), dry_run=form.dry_run.data)
+            except ValueError as e:
+                flash(f'Could not read {upload.filename}: {e}', 'error')
+            except ImportAborted as e:
+                report = e.report
+                flash(f'Import stopped by a database error ({e}). {report.sessions} sessions '
+                      f'({report.results} results) from earlier chunks were already imported.', 'error')
+            else:
+                flash(report.summary(), 'error' if report.errors else 'success')
+        return self.render('admin/game_import.html', form=form, report=report, columns=COLUMNS)
+
+class GameExportView(AdminAccessMixin, BaseView):
+    """Download the league history as a streamed file (same data as `flask games export`)"""
+    @expose('/')
+    def index(self):
+        from app.exporter import DATASETS, available_formats
+        return self.render('admin/game_export.html', datasets=DATASETS, formats=available_formats())
+
+    @expose('/download')
+    def download(self):
+        from app.exporter import MIMETYPES, export_chunks
+
+        dataset = request.args.get('dataset', 'results')
+        fmt = request.args.get('format', 'csv')
+        try:
+            start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+            end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+            chunks = export_chunks(dataset, fmt, start, end)
+        except ValueError as e:
+            abort(400, str(e))
+        filename = f'mtg-{dataset}-{date.today().isoformat()}.{fmt}'
+        return Response(stream_with_context(chunks), mimetype=MIMETYPES[fmt],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -0,0 +1,287 @@
+"""Vectorized league analytics on pandas/NumPy, served under /api/analytics/*.
+
+All game results are loaded once per data version into one compact frame
+(categorical ids and names, int8 finish and pod size), and every table
+is a grouped aggregation over it. LeagueAnalytics objects are cached per
+process and rebuilt the first time they are asked for after a write
+bumps the DataVersion.
+
+As in the rollups, "wins" and "win_rate" only count valid (4+ player)
+games; per-pod-size tables and recent form count any first place.
+
+Time series are read from the daily_stats buckets instead of the frame,
+so a trend query only touches the days and entity it asks for.
+"""
+import threading
+from functools import cached_property
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from app import db
+from app.models import Player, Deck, ColorIdentity, GameSession, GameResult, DailyStats, current_data_version
+
+VALID_POD_SIZE = 4
+FORM_GAMES = 10
+FORM_MAX_GAMES = 100
+TIMESERIES_METRICS = ('games', 'win_rate', 'color_usage')
+TIMESERIES_BUCKETS = {'day': 'D', 'week': 'W', 'month': 'M'}
+
+
+def load_results():
+    """One row per game result with its session, player and deck, from a single query"""
+    stmt = (
+        sa.select(
+            GameResult.gr_session_id.label('session_id'),
+            GameSession.game_date,
+            GameSession.player_count,
+            GameResult.player_id,
+            Player.player_name,
+            GameResult.deck_id,
+            Deck.deck_name,
+            Deck.color_identity_code,
+            GameResult.finish,
+            GameResult.eliminated_by_id,
+        )
+        .join(GameSession, GameResult.gr_session_id == GameSession.id)
+        .join(Player, GameResult.player_id == Player.id)
+        .join(Deck, GameResult.deck_id == Deck.id)
+        .order_by(GameSession.game_date, GameResult.gr_session_id, GameResult.finish)
+    )
+    frame = pd.DataFrame(db.session.execute(stmt).all(), columns=list(stmt.selected_columns.keys()))
+
+    frame['session_id'] = frame['session_id'].astype('int32')
+    frame['game_date'] = pd.to_datetime(frame['game_date'])
+    frame['player_count'] = frame['player_count'].astype('int8')
+    frame['finish'] = frame['finish'].astype('int8')
+    # Eliminators share the player categories, so .cat.codes index the same players either way
+    player_ids = pd.Index(frame['player_id']).union(frame['eliminated_by_id'].dropna().astype('int64')).unique()
+    frame['player_id'] = pd.Categorical(frame['player_id'], categories=player_ids)
+    frame['eliminated_by_id'] = pd.Categorical(frame['eliminated_by_id'], categories=player_ids)
+    for column in ('player_name', 'deck_id', 'deck_name', 'color_identity_code'):
+        frame[column] = frame[column].astype('category')
+
+    frame['first'] = frame['finish'] == 1
+    frame['valid'] = frame['player_count'] >= VALID_POD_SIZE
+    frame['win'] = frame['valid'] & frame['first']
+    frame['eliminated'] = frame['eliminated_by_id'].notna()
+    return frame
+
+
+def _win_rate(wins, games):
+    return np.where(games > 0, wins / np.maximum(games, 1), 0.0)
+
+
+def _summary(frame, keys):
+    """games/valid_games/wins/win_rate/avg_finish/eliminations_received per group"""
+    table = frame.groupby(keys, observed=True).agg(
+        games=('finish', 'size'),
+        valid_games=('valid', 'sum'),
+        wins=('win', 'sum'),
+        avg_finish=('finish', 'mean'),
+        eliminations_received=('eliminated', 'sum'),
+        last_played=('game_date', 'max'),
+    )
+    table['win_rate'] = _win_rate(table['wins'], table['valid_games'])
+    return table
+
+
+class LeagueAnalytics:
+    """Stats tables over one load of the results frame; each is computed on first use"""
+
+    def __init__(self, results, version):
+        self.results = results
+        self.version = version
+
+    @cached_property
+    def players(self):
+        table = _summary(self.results, ['player_id', 'player_name'])
+        dealt = self.results['eliminated_by_id'].value_counts()
+        table['eliminations_dealt'] = dealt.reindex(table.index.get_level_values('player_id'), fill_value=0).to_numpy()
+        return table.reset_index().sort_values(['win_rate', 'wins'], ascending=False)
+
+    @cached_property
+    def decks(self):
+        table = _summary(self.results, ['deck_id', 'deck_name', 'color_identity_code'])
+        return table.reset_index().sort_values(['win_rate', 'wins'], ascending=False)
+
+    @cached_property
+    def colors(self):
+        table = _summary(self.results, ['color_identity_code'])
+        table['decks'] = self.results.groupby('color_identity_code', observed=True)['deck_id'].nunique()
+        return table.reset_index().sort_values('games', ascending=False)
+
+    @cached_property
+    def pod_sizes(self):
+        """Per player and pod size; here a win is any first place"""
+        table = self.results.groupby(['player_id', 'player_name', 'player_count'], observed=True).agg(
+            games=('finish', 'size'),
+            wins=('first', 'sum'),
+            avg_finish=('finish', 'mean'),
+        )
+        table['win_rate'] = _win_rate(table['wins'], table['games'])
+        # What a player would win by chance in a pod that size
+        table['expected_win_rate'] = 1 / table.index.get_level_values('player_count').to_numpy()
+        return table.reset_index().rename(columns={'player_count': 'pod_size'})
+
+    @cached_property
+    def player_index(self):
+        """(id, name) for each row/column of the player matrices, in category order"""
+        ids = self.results['player_id'].cat.categories
+        names = dict(zip(self.results['player_id'].to_numpy(), self.results['player_name'].to_numpy()))
+        return [{'id': int(player_id), 'name': names.get(player_id, '')} for player_id in ids]
+
+    def _pair_counts(self, rows, columns, mask=None):
+        """Dense players x players int32 matrix counting (rows[k], columns[k]) pairs"""
+        size = len(self.results['player_id'].cat.categories)
+        if mask is not None:
+            rows, columns = rows[mask], columns[mask]
+        counts = np.bincount(rows.astype(np.int64) * size + columns, minlength=size * size)
+        return counts.astype(np.int32).reshape(size, size)
+
+    @cached_property
+    def eliminations(self):
+        """matrix[i][j] = times player i eliminated player j"""
+        killers = self.results['eliminated_by_id'].cat.codes.to_numpy()
+        victims = self.results['player_id'].cat.codes.to_numpy()
+        return self._pair_counts(killers, victims, mask=killers >= 0)
+
+    @cached_property
+    def head_to_head(self):
+        """(meetings, ahead): games players i and j shared a pod, and how often i finished above j"""
+        seats = pd.DataFrame({
+            'session_id': self.results['session_id'].to_numpy(),
+            'player': self.results['player_id'].cat.codes.to_numpy(),
+            'finish': self.results['finish'].to_numpy(),
+        })
+        # Every ordered pair of seats in the same pod, a handful per session
+        pairs = seats.merge(seats, on='session_id', suffixes=('', '_other'))
+        pairs = pairs[pairs['player'] != pairs['player_other']]
+        rows, columns = pairs['player'].to_numpy(), pairs['player_other'].to_numpy()
+        meetings = self._pair_counts(rows, columns)
+        ahead = self._pair_counts(rows, columns, mask=(pairs['finish'] < pairs['finish_other']).to_numpy())
+        return meetings, ahead
+
+    def form(self, games=FORM_GAMES):
+        """Win rate and average finish over each player's last `games` games"""
+        recent = self.results.groupby('player_id', observed=True).tail(games)
+        table = recent.groupby(['player_id', 'player_name'], observed=True).agg(
+            games=('finish', 'size'),
+            wins=('first', 'sum'),
+            avg_finish=('finish', 'mean'),
+            last_played=('game_date', 'max'),
+        )
+        table['win_rate'] = _win_rate(table['wins'], table['games'])
+        return table.reset_index().sort_values(['win_rate', 'avg_finish'], ascending=[False, True])
+
+    def player_form(self, player_id, games=FORM_GAMES):
+        """Rolling win rate and average finish across one player's games, oldest first"""
+        mine = self.results[self.results['player_id'] == player_id]
+        window = mine[['first', 'finish']].astype('float64').rolling(games, min_periods=1).mean()
+        return pd.DataFrame({
+            'session_id': mine['session_id'],
+            'game_date': mine['game_date'],
+            'finish': mine['finish'],
+            'rolling_win_rate': window['first'],
+            'rolling_avg_finish': window['finish'],
+        })
+
+
+_cache = {'analytics': None}
+_lock = threading.Lock()
+
+
+def get_analytics():
+    """LeagueAnalytics for the current data version, loading the frame if it changed"""
+    version = current_data_version()
+    analytics = _cache['analytics']
+    if analytics is not None and analytics.version == version:
+        return analytics
+    with _lock:
+        analytics = _cache['analytics']
+        if analytics is None or analytics.version != version:
+            analytics = LeagueAnalytics(load_results(), version)
+            _cache['analytics'] = analytics
+    return analytics
+
+
+def _timeseries_entity(entity):
+    """(dimension, key, series name) for ?entity=league|player:<id>|deck:<id>|color:<code>"""
+    dimension, _, key = entity.partition(':')
+    if dimension == 'league' and not key:
+        return 'league', '', 'League'
+    if dimension == 'color' and key:
+        name = db.session.scalar(sa.select(ColorIdentity.identity_name).where(ColorIdentity.code == key))
+    elif dimension in ('player', 'deck') and key.isdigit():
+        model, column = (Player, Player.player_name) if dimension == 'player' else (Deck, Deck.deck_name)
+        name = db.session.scalar(sa.select(column).where(model.id == int(key)))
+    else:
+        raise ValueError(f'unknown entity "{entity}", expected league, player:<id>, deck:<id> or color:<code>')
+    if name is None:
+        raise ValueError(f'no {dimension} "{key}"')
+    return dimension, key, name
+
+
+def timeseries(metric, entity='league', bucket='week', start=None, end=None):
+    """ApexCharts-style {series: [{name, data: [{x, y}]}]} summed from daily_stats per bucket.
+
+    games counts sessions for the league and seats otherwise; win_rate is wins
+    over valid games (null for buckets without any); color_usage is each color
+    identity's share of league seats. Buckets without games are filled in.
+    """
+    if metric not in TIMESERIES_METRICS:
+        raise ValueError(f'unknown metric "{metric}", expected one of {", ".join(TIMESERIES_METRICS)}')
+    if bucket not in TIMESERIES_BUCKETS:
+        raise ValueError(f'unknown bucket "{bucket}", expected one of {", ".join(TIMESERIES_BUCKETS)}')
+    dimension, key, name = _timeseries_entity(entity)
+    if metric == 'color_usage':
+        if dimension != 'league':
+            raise ValueError('color_usage is only available for the league')
+        dimension = 'color'
+    elif metric == 'win_rate' and dimension == 'league':
+        raise ValueError('win_rate needs a player, deck or color entity')
+
+    stmt = (
+        sa.select(DailyStats.day, DailyStats.key, DailyStats.games, DailyStats.valid_games, DailyStats.wins)
+        .where(DailyStats.dimension == dimension)
+        .order_by(DailyStats.day)
+    )
+    if metric != 'color_usage':
+        stmt = stmt.where(DailyStats.key == key)
+    if start is not None:
+        stmt = stmt.where(DailyStats.day >= start)
+    if end is not None:
+        stmt = stmt.where(DailyStats.day <= end)
+    frame = pd.DataFrame(db.session.execute(stmt).all(), columns=list(stmt.selected_columns.keys()))
+    result = {'metric': metric, 'entity': entity, 'bucket': bucket, 'series': []}
+    if frame.empty:
+        return result
+
+    periods = pd.to_datetime(frame['day']).dt.to_period(TIMESERIES_BUCKETS[bucket])
+    frame['period'] = periods
+    table = frame.groupby(['period', 'key'])[['games', 'valid_games', 'wins']].sum().unstack('key', fill_value=0)
+    table = table.reindex(pd.period_range(periods.min(), periods.max()), fill_value=0)
+    x = table.index.start_time.strftime('%Y-%m-%d')
+
+    def points(values):
+        return [{'x': when, 'y': None if pd.isna(y) else round(float(y), 4)} for when, y in zip(x, values)]
+
+    if metric == 'games':
+        counts = table[('games', key)]
+        result['series'] = [{'name': name, 'data': [{'x': when, 'y': int(y)} for when, y in zip(x, counts)]}]
+    elif metric == 'win_rate':
+        valid = table[('valid_games', key)]
+        result['series'] = [{'name': name, 'data': points(table[('wins', key)] / valid.where(valid > 0))}]
+    else:
+        seats = table['games']
+        share = seats.div(seats.sum(axis=1).where(lambda total: total > 0), axis=0)
+        for code in seats.sum().sort_values(ascending=False).index:
+            result['series'].append({'name': code, 'data': points(share[code])})
+    return result
+
+
+def to_json(table):
+    """JSON array of records with YYYY-MM-DD dates, serialized by pandas rather than per row"""
+    table = table.copy()
+    for column in table.select_dtypes('datetime').columns:
+        table[column] = table[column].dt.strftime('%Y-%m-%d')
+    return table.to_json(orient='records')
@@ -2,11 +2,12 @@ from flask import render_template, redirect, url_for, flash, request
 from urllib.parse import urlsplit
 from flask_login import login_user, logout_user, current_user
 import sqlalchemy as sa
-from app import db
+from app import db, rate_limiter
 from app.auth import bp
 from app.auth.forms import LoginForm, RegistrationForm, ResetPasswordRequestForm, ResetPasswordForm
 from app.models import User
 from app.auth.email import send_password_reset_email
+from app.ratelimit import client_ip
 
 
 
@@ -16,6 +17,12 @@ from app.auth.email import send_password_reset_email
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
+    if request.method == 'POST':
+        # Before the user lookup and check_password_hash
+        limited = rate_limiter.throttle(('login_ip', client_ip()),
+                                        ('login_user', request.form.get('username')))
+        if limited:
+            return limited
     form = LoginForm()
     if form.validate_on_submit():
         user = db.session.scalar(
@@ -63,6 +70,11 @@ def logout():
 def reset_password_request():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
+    if request.method == 'POST':
+        limited = rate_limiter.throttle(('reset_ip', client_ip()),
+                                        ('reset_email', request.form.get('email')))
+        if limited:
+            return limited
     form = ResetPasswordRequestForm()
     if form.validate_on_submit():
         user = db.session.scalar(
@@ -0,0 +1,183 @@
+"""Synthetic league generator and endpoint benchmark behind `flask bench`.
+
+The league is seeded deterministically from --seed, so two runs with the
+same options hit identical data and their JSON reports can be diffed.
+"""
+import random
+import re
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+import sqlalchemy as sa
+from app import db
+from app.models import (User, Player, Deck, DeckColor, ColorIdentity, GameSession, GameResult,
+                        update_player_counts, refresh_color_masks, refresh_player_stats, refresh_deck_stats,
+                        refresh_daily_stats, replay_ratings, bump_data_version)
+
+COLOR_IDENTITIES = [
+    ('W', 'White'), ('U', 'Blue'), ('B', 'Black'), ('R', 'Red'), ('G', 'Green'), ('C', 'Colorless'),
+    ('WU', 'Azorius'), ('UB', 'Dimir'), ('BR', 'Rakdos'), ('RG', 'Gruul'), ('WG', 'Selesnya'),
+    ('WB', 'Orzhov'), ('UR', 'Izzet'), ('BG', 'Golgari'), ('WR', 'Boros'), ('UG', 'Simic'),
+    ('WUB', 'Esper'), ('UBR', 'Grixis'), ('BRG', 'Jund'), ('RGW', 'Naya'), ('GWU', 'Bant'),
+    ('WUBRG', 'Five-Color'),
+]
+
+BENCH_USER = 'bench-admin'
+BENCH_PASSWORD = 'bench-password'
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def seed_league(players=40, decks=200, games=2000, seed=1234, chunk_size=1000):
+    """Fill an empty database with a synthetic league of four-player pods.
+
+    Rows go in with executemany inserts, then the derived columns,
+    rollups and ratings are rebuilt once instead of per flush.
+    """
+    rng = random.Random(seed)
+    connection = db.session.connection()
+
+    db.session.execute(sa.insert(ColorIdentity), [
+        {'code': code, 'identity_name': name} for code, name in COLOR_IDENTITIES
+    ])
+    db.session.execute(sa.insert(Player), [
+        {'id': i, 'player_name': f'Player {i:04d}'} for i in range(1, players + 1)
+    ])
+
+    deck_rows, deck_color_rows = [], []
+    decks_by_owner = {i: [] for i in range(1, players + 1)}
+    for deck_id in range(1, decks + 1):
+        owner_id = (deck_id - 1) % players + 1
+        code, _ = rng.choice(COLOR_IDENTITIES)
+        deck_rows.append({'id': deck_id, 'deck_name': f'Deck {deck_id:05d}',
+                          'color_identity_code': code, 'owner_id': owner_id})
+        deck_color_rows.extend({'deck_id': deck_id, 'color_id': color} for color in code)
+        decks_by_owner[owner_id].append(deck_id)
+    db.session.execute(sa.insert(Deck), deck_rows)
+    db.session.execute(sa.insert(DeckColor), deck_color_rows)
+
+    start = date(2020, 1, 1)
+    for first in range(1, games + 1, chunk_size):
+        session_rows, result_rows = [], []
+        for session_id in range(first, min(first + chunk_size, games + 1)):
+            session_rows.append({'id': session_id, 'game_date': start + timedelta(days=session_id // 3),
+                                 'gs_wincon': rng.choice(['Combat', 'Combo', 'Alt win', None])})
+            pod = rng.sample(range(1, players + 1), min(4, players))
+            for finish, player_id in enumerate(pod, start=1):
+                result_rows.append({
+                    'gr_session_id': session_id,
+                    'player_id': player_id,
+                    'deck_id': rng.choice(decks_by_owner[player_id] or [1]),
+                    'finish': finish,
+                    'eliminated_by_id': rng.choice(pod[:finish - 1]) if finish > 1 else None
+                })
+        db.session.execute(sa.insert(GameSession), session_rows)
+        db.session.execute(sa.insert(GameResult), result_rows)
+
+    refresh_color_masks(connection)
+    update_player_counts(connection, list(range(1, games + 1)))
+    refresh_player_stats(connection)
+    refresh_deck_stats(connection)
+    refresh_daily_stats(connection)
+    replay_ratings(connection)
+    bump_data_version(connection)
+
+    admin = User(username=BENCH_USER, email='bench@example.com', is_admin=True)
+    admin.set_password(BENCH_PASSWORD)
+    db.session.add(admin)
+    db.session.commit()
+
+
+def _game_form(rng, players, decks_by_owner, game_date):
+    pod = rng.sample(players, 4)
+    data = {'game_date': game_date.isoformat(), 'gs_wincon': 'Bench', 'comments': ''}
+    for i, player_id in enumerate(pod):
+        data[f'results-{i}-player_id'] = player_id
+        data[f'results-{i}-deck_id'] = rng.choice(decks_by_owner[player_id])
+        data[f'results-{i}-finish'] = i + 1
+        data[f'results-{i}-eliminated_by_id'] = pod[0] if i else 0
+    return data
+
+
+def _measure(client, method, url, data=None, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    response = client.open(url, method=method, data=data)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    match = _SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+    return {
+        'status': response.status_code,
+        'seconds': elapsed,
+        'queries': int(match.group(1)) if match else None,
+        'peak_bytes': peak,
+    }
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmarks(app, repeat=20, seed=1234):
+    """Time every read endpoint plus add_game/edit_game_session POSTs through the test client"""
+    rng = random.Random(seed)
+    players = db.session.scalars(sa.select(Player.id).order_by(Player.id)).all()
+    decks_by_owner = {}
+    for deck_id, owner_id in db.session.execute(sa.select(Deck.id, Deck.owner_id)):
+        decks_by_owner.setdefault(owner_id, []).append(deck_id)
+    players = [p for p in players if decks_by_owner.get(p)]
+    session_id = db.session.scalar(sa.select(sa.func.min(GameSession.id)))
+    db.session.remove()
+
+    client = app.test_client()
+    client.post('/auth/login', data={'username': BENCH_USER, 'password': BENCH_PASSWORD})
+
+    cases = [
+        ('GET /', 'GET', '/', None),
+        ('GET /players', 'GET', '/players', None),
+        ('GET /decks', 'GET', '/decks', None),
+        ('GET /game_results', 'GET', '/game_results', None),
+        ('GET /api/players', 'GET', '/api/players', None),
+        ('GET /api/players page', 'GET', '/api/players?page=1&size=25', None),
+        ('GET /api/decks', 'GET', '/api/decks', None),
+        ('GET /api/decks page', 'GET', '/api/decks?page=2&size=25&sort[0][field]=win_rate&sort[0][dir]=desc', None),
+        ('GET /api/game_sessions', 'GET', '/api/game_sessions', None),
+        ('GET /api/game_sessions keyset', 'GET', '/api/game_sessions?limit=50', None),
+        ('GET /api/dashboard', 'GET', '/api/dashboard', None),
+        ('GET /api/dashboard/kpis', 'GET', '/api/dashboard/kpis', None),
+        ('GET /api/dashboard/colors', 'GET', '/api/dashboard/colors', None),
+        ('GET /api/dashboard/color-counts', 'GET', '/api/dashboard/color-counts', None),
+        ('GET /api/dashboard/commander-identities', 'GET', '/api/dashboard/commander-identities', None),
+        ('GET /add_game', 'GET', '/add_game', None),
+        ('GET /game_session/edit', 'GET', f'/game_session/edit/{session_id}', None),
+        ('POST /add_game', 'POST', '/add_game',
+         lambda i: _game_form(rng, players, decks_by_owner, date(2030, 1, 1) + timedelta(days=i))),
+        ('POST /game_session/edit', 'POST', f'/game_session/edit/{session_id}',
+         lambda i: _game_form(rng, players, decks_by_owner, date(2020, 1, 1))),
+    ]
+
+    results = {}
+    for name, method, url, make_data in cases:
+        runs = [
+            _measure(client, method, url, make_data(i) if make_data else None)
+            for i in range(repeat)
+        ]
+        memory_run = _measure(client, method, url, make_data(repeat) if make_data else None,
+                              trace_memory=True)
+        timings_ms = [run['seconds'] * 1000 for run in runs]
+        results[name] = {
+            'status': sorted({run['status'] for run in runs}),
+            'p50_ms': round(statistics.median(timings_ms), 3),
+            'p95_ms': round(_percentile(timings_ms, 95), 3),
+            'mean_ms': round(statistics.fmean(timings_ms), 3),
+            'queries': max((run['queries'] or 0) for run in runs),
+            'peak_kib': round(memory_run['peak_bytes'] / 1024, 1),
+        }
+    return results
@@ -0,0 +1,239 @@
+"""Response cache for the read-only /api/* endpoints.
+
+Entries are keyed by a data generation plus the request path. The
+generation changes after every commit that wrote league data, so stale
+entries simply stop being looked up and age out of the backend.
+
+Backends:
+  memory      per-process LRU with TTL; keyed on the DataVersion row
+              (app/models.py), one primary-key read per request, so every
+              gunicorn worker stops serving old bodies at the next commit
+  filesystem  pickled entries and a generation file in CACHE_DIR, shared
+              by every worker on the host
+  null        caching disabled
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, Response
+import sqlalchemy.orm as so
+import sqlalchemy as sa
+
+
+class NullCache:
+    shared_generation = True
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def get_generation(self):
+        return '0'
+
+    def bump_generation(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache:
+    """Thread-safe LRU dict whose entries expire after ttl seconds"""
+
+    # Only this process sees bump_generation(), so ResponseCache keys on DataVersion instead
+    shared_generation = False
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = str(time.time_ns())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_generation(self):
+        return self._generation
+
+    def bump_generation(self):
+        # Old-generation entries can never be hit again, drop them now
+        self._generation = str(time.time_ns())
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileSystemCache:
+    """One pickle file per entry in a directory shared across worker processes"""
+
+    shared_generation = True
+
+    def __init__(self, directory, ttl=300):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._generation_path = os.path.join(directory, 'generation')
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def _write(self, path, payload):
+        # Write then rename, so readers in other workers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires < time.time():
+            return None
+        return value
+
+    def set(self, key, value):
+        self._write(self._path(key), pickle.dumps((time.time() + self.ttl, value)))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def get_generation(self):
+        try:
+            with open(self._generation_path) as f:
+                return f.read().strip() or '0'
+        except OSError:
+            return '0'
+
+    def bump_generation(self):
+        # A fresh timestamp rather than +1, so two workers bumping at once can't agree on a stale value
+        self._write(self._generation_path, str(time.time_ns()).encode())
+        self.clear()
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.cache'))
+
+
+class ResponseCache:
+    """Flask extension wrapping a cache backend with a view decorator and hit/miss counters"""
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_TTL', 300)
+        if backend == 'memory':
+            self.backend = MemoryCache(max_entries=app.config.get('CACHE_MAX_ENTRIES', 512), ttl=ttl)
+        elif backend == 'filesystem':
+            directory = app.config.get('CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+            self.backend = FileSystemCache(directory, ttl=ttl)
+        else:
+            self.backend = NullCache()
+        app.extensions['response_cache'] = self
+
+    def generation(self):
+        if self.backend.shared_generation:
+            return self.backend.get_generation()
+        from app.models import current_data_version
+        return str(current_data_version())
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def cached(self, view):
+        """Cache successful, non-streamed responses of a GET view by generation + full path"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            key = f'{self.generation()}:{request.full_path}'
+            entry = self.backend.get(key)
+            if entry is not None:
+                self._count(hit=True)
+                body, status, headers = entry
+                response = Response(body, status=status, headers=headers)
+                return response.make_conditional(request)
+            self._count(hit=False)
+            response = view(*args, **kwargs)
+            if not isinstance(response, Response):
+                return response
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [(k, v) for k, v in response.headers.items() if k != 'Content-Length']
+                self.backend.set(key, (response.get_data(), response.status_code, headers))
+            return response
+        return wrapper
+
+    def invalidate(self):
+        self.backend.bump_generation()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.backend),
+            'generation': self.generation()
+        }
+
+
+def register_invalidation(cache):
+    """Bump the cache generation after any commit that changed league data"""
+    @sa.event.listens_for(so.Session, 'after_commit')
+    def _invalidate_after_commit(session):
+        if session.info.pop('data_version_bumped', False):
+            cache.invalidate()
+
+    @sa.event.listens_for(so.Session, 'after_soft_rollback')
+    def _forget_rolled_back_changes(session, previous_transaction):
+        session.info.pop('data_version_bumped', None)
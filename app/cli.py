@@ -0,0 +1,166 @@
+import contextlib
+import json
+import os
+import sys
+import platform
+import tempfile
+import time
+import click
+import sqlalchemy as sa
+from flask import Blueprint, current_app
+from app import db, mail_queue
+from app.models import refresh_color_masks, refresh_player_stats, refresh_deck_stats, refresh_daily_stats, replay_ratings
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group()
+def stats():
+    """Player/deck stats rollup commands."""
+    pass
+
+
+@stats.command()
+def rebuild():
+    """Recompute deck color masks, player_stats, deck_stats, daily_stats and ratings from the full game history."""
+    connection = db.session.connection()
+    refresh_color_masks(connection)
+    refresh_player_stats(connection)
+    refresh_deck_stats(connection)
+    refresh_daily_stats(connection)
+    replay_ratings(connection)
+    db.session.commit()
+    click.echo('Rebuilt color masks, player_stats, deck_stats, daily_stats and ratings.')
+
+
+@bp.cli.group()
+def games():
+    """Bulk game session import/export."""
+    pass
+
+
+@games.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=500, show_default=True, help='Sessions per transaction.')
+@click.option('--dry-run', is_flag=True, help='Validate the file without inserting anything.')
+def import_games_command(path, chunk_size, dry_run):
+    """Import game sessions from a CSV or XLSX file (one row per game result)."""
+    from app.importer import ImportAborted, read_rows, import_games
+
+    with open(path, 'rb') as f:
+        try:
+            report = import_games(read_rows(f, path), chunk_size=chunk_size, dry_run=dry_run)
+        except ValueError as e:
+            raise click.ClickException(f'{path}: {e}')
+        except ImportAborted as e:
+            raise click.ClickException(f'{path}: database error ({e}); {e.report.sessions} sessions '
+                                       f'({e.report.results} results) from earlier chunks were already imported')
+    for row_number, message in report.errors:
+        click.echo(f'row {row_number}: {message}', err=True)
+    click.echo(report.summary())
+    if report.errors:
+        sys.exit(1)
+
+
+@games.command('export')
+@click.option('--dataset', type=click.Choice(['results', 'sessions', 'players', 'decks']),
+              default='results', show_default=True, help='What to export.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson', 'parquet']),
+              default='csv', show_default=True, help='Output format (parquet needs pyarrow).')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='First game date to include (results/sessions).')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='Last game date to include (results/sessions).')
+@click.option('--output', type=click.File('wb'), default='-', help='Where to write the export.')
+def export_games_command(dataset, fmt, start, end, output):
+    """Stream a dataset of the league history to a file or stdout."""
+    from app.exporter import export_chunks
+
+    try:
+        chunks = export_chunks(dataset, fmt, start and start.date(), end and end.date())
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for chunk in chunks:
+        output.write(chunk)
+
+
+@bp.cli.group()
+def mail():
+    """Outbound email queue."""
+    pass
+
+
+@mail.command('status')
+def mail_status():
+    """Print queue depth, send counters and SMTP send latency as JSON."""
+    click.echo(json.dumps(mail_queue.stats(), indent=2))
+
+
+@mail.command('test')
+@click.argument('recipient')
+@click.option('--timeout', default=30, show_default=True, help='Seconds to wait for the queue to drain.')
+def mail_test(recipient, timeout):
+    """Queue a test message to RECIPIENT and wait for the workers to send it."""
+    from app.email import send_email
+
+    send_email('[KeyMTG] Test email', sender=current_app.config['ADMINS'][0], recipients=[recipient],
+               text_body='Sent by flask mail test.', html_body='<p>Sent by <code>flask mail test</code>.</p>')
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = mail_queue.stats()
+        if stats['sent_total'] or stats['failed_total'] or stats['retried_total']:
+            break
+        time.sleep(0.1)
+    click.echo(json.dumps(mail_queue.stats(), indent=2))
+
+
+@bp.cli.command()
+@click.option('--players', default=40, show_default=True, help='Synthetic players.')
+@click.option('--decks', default=200, show_default=True, help='Synthetic decks (spread over players).')
+@click.option('--games', default=2000, show_default=True, help='Four-player game sessions.')
+@click.option('--repeat', default=20, show_default=True, help='Timed requests per endpoint.')
+@click.option('--seed', default=1234, show_default=True, help='Random seed for data and POST bodies.')
+@click.option('--database-url', default=None,
+              help='Empty database to seed. Defaults to a temporary SQLite file.')
+@click.option('--cache/--no-cache', default=False, show_default=True,
+              help='Keep the API response cache on while timing.')
+@click.option('--output', type=click.File('w'), default='-', help='Where to write the JSON report.')
+def bench(players, decks, games, repeat, seed, database_url, cache, output):
+    """Seed a synthetic league and report latency, query counts and memory per endpoint."""
+    from config import Config
+    from app import create_app
+    from app.bench import seed_league, run_benchmarks
+    from app.models import Player
+
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='mtg-bench-'), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        CACHE_BACKEND = 'memory' if cache else 'null'
+        SQL_INSTRUMENTATION = True
+        # Timings go in the report, not the log
+        SQL_MAX_QUERIES_PER_REQUEST = float('inf')
+        SQL_SLOW_REQUEST_MS = float('inf')
+        SQL_SLOW_QUERY_MS = float('inf')
+
+    bench_app = create_app(BenchConfig)
+    # Views may print; keep stdout clean for the JSON report
+    with bench_app.app_context(), contextlib.redirect_stdout(sys.stderr):
+        db.create_all()
+        if db.session.scalar(sa.select(sa.func.count(Player.id))):
+            raise click.UsageError(f'{database_url} already has players; bench needs an empty database.')
+        seed_league(players=players, decks=decks, games=games, seed=seed)
+        results = run_benchmarks(bench_app, repeat=repeat, seed=seed)
+        dialect = db.engine.dialect.name
+
+    report = {
+        'parameters': {'players': players, 'decks': decks, 'games': games,
+                       'repeat': repeat, 'seed': seed, 'cache': cache},
+        'environment': {'python': platform.python_version(), 'sqlalchemy': sa.__version__,
+                        'dialect': dialect},
+        'results': results,
+    }
+    output.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
@@ -1,15 +1,260 @@
-from flask_mail import Message
-from app import mail
+"""Outbound email queue.
+
+send_email() spools each message as a JSON file in MAIL_SPOOL_DIR
+(default instance/mail-spool) and returns straight away. A fixed pool of
+MAIL_WORKERS threads claims up to MAIL_BATCH_SIZE due messages at a time
+by renaming them to *.sending, and sends the batch over one SMTP
+connection. A failed message is spooled again after
+MAIL_RETRY_DELAY * 2**attempts seconds, and is kept as *.failed once
+MAIL_MAX_ATTEMPTS is reached, for MAIL_FAILED_RETENTION seconds
+(default a week).
+
+Spooled messages hold rendered bodies, password reset links included,
+so the directory is created 0700 and every spool file 0600.
+
+The spool outlives the process: messages queued before a restart are
+sent by the next one, and claims left behind by a killed worker are
+released after MAIL_CLAIM_TIMEOUT. At exit the workers finish their
+current batch (for up to MAIL_SHUTDOWN_TIMEOUT seconds) and stop.
+
+To watch the queue work locally, run a debug SMTP server with
+    python -m aiosmtpd -n -l localhost:8025
+set MAIL_SERVER=localhost and MAIL_PORT=8025, and send a message with
+`flask mail test you@example.com`.
+"""
+import atexit
+import json
+import os
+import smtplib
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
 from flask import current_app
-from threading import Thread
+from flask_mail import Message
+
+SPOOL_SUFFIX = '.json'
+CLAIM_SUFFIX = '.sending'
+FAILED_SUFFIX = '.failed'
+
+
+class MailQueue:
+    """Flask extension: a spool directory drained by a bounded pool of sender threads"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._latencies = deque(maxlen=1000)  # seconds per SMTP send
+        self._workers = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get('MAIL_SPOOL_DIR') or os.path.join(app.instance_path, 'mail-spool')
+        self.workers = app.config.get('MAIL_WORKERS', 2)
+        self.batch_size = app.config.get('MAIL_BATCH_SIZE', 20)
+        self.max_attempts = app.config.get('MAIL_MAX_ATTEMPTS', 5)
+        self.retry_delay = app.config.get('MAIL_RETRY_DELAY', 30)
+        self.claim_timeout = app.config.get('MAIL_CLAIM_TIMEOUT', 600)
+        self.poll_interval = app.config.get('MAIL_POLL_INTERVAL', 5)
+        self.shutdown_timeout = app.config.get('MAIL_SHUTDOWN_TIMEOUT', 10)
+        self.failed_retention = app.config.get('MAIL_FAILED_RETENTION', 7 * 24 * 3600)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        os.chmod(self.directory, 0o700)  # makedirs leaves an existing directory alone
+        app.extensions['mail_queue'] = self
+        if self._spooled():
+            # Left over from a previous run
+            self._start_workers()
+
+    def enqueue(self, msg):
+        """Spool a flask_mail Message for the worker pool"""
+        self._write(self._path(time.time(), uuid.uuid4().hex, SPOOL_SUFFIX), {
+            'subject': msg.subject,
+            'sender': msg.sender,
+            'recipients': msg.recipients,
+            'body': msg.body,
+            'html': msg.html,
+            'queued_at': time.time(),
+            'attempts': 0,
+        })
+        self._start_workers()
+        self._wakeup.set()
+
+    def shutdown(self):
+        """Stop the workers after their current batch; unsent messages stay spooled"""
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for worker in self._workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        counts = {SPOOL_SUFFIX: 0, CLAIM_SUFFIX: 0, FAILED_SUFFIX: 0}
+        for name in os.listdir(self.directory):
+            suffix = os.path.splitext(name)[1]
+            if suffix in counts:
+                counts[suffix] += 1
+        return {
+            'workers': sum(1 for worker in self._workers if worker.is_alive()),
+            'queued': counts[SPOOL_SUFFIX],
+            'sending': counts[CLAIM_SUFFIX],
+            'failed': counts[FAILED_SUFFIX],
+            'sent_total': self.sent,
+            'retried_total': self.retried,
+            'failed_total': self.failed,
+            'send_ms_p50': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+            'send_ms_p95': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3) if latencies else None,
+            'send_ms_max': round(latencies[-1] * 1000, 3) if latencies else None,
+        }
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _start_workers(self):
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            if self._stopping.is_set():
+                return
+            while len(self._workers) < self.workers:
+                worker = threading.Thread(target=self._run, name=f'mail-worker-{len(self._workers)}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._claim()
+            if batch:
+                self._send_batch(batch)
+            else:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    # Spool files are named <due time in ns>-<id><suffix>, so sorting the names sorts by due time
+    def _path(self, due, message_id, suffix):
+        return os.path.join(self.directory, f'{int(due * 1e9):020d}-{message_id}{suffix}')
+
+    def _write(self, path, entry):
+        # Write then rename, so a worker never claims a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.chmod(tmp_path, 0o600)  # Renames keep the mode, so claims and *.failed stay private
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def _spooled(self):
+        return any(name.endswith(SPOOL_SUFFIX) for name in os.listdir(self.directory))
+
+    def _release_stale_claims(self, names):
+        now = time.time()
+        for name in names:
+            if not name.endswith(CLAIM_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.claim_timeout:
+                    os.rename(path, path[:-len(CLAIM_SUFFIX)] + SPOOL_SUFFIX)
+            except OSError:
+                pass
+
+    def _purge_failed(self, names):
+        now = time.time()
+        for name in names:
+            if not name.endswith(FAILED_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.failed_retention:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _claim(self):
+        """Up to batch_size due (path, entry) pairs, renamed to *.sending so no other worker takes them"""
+        names = os.listdir(self.directory)
+        self._release_stale_claims(names)
+        self._purge_failed(names)
+        now_ns = time.time_ns()
+        batch = []
+        for name in sorted(n for n in names if n.endswith(SPOOL_SUFFIX)):
+            if int(name.split('-', 1)[0]) > now_ns or len(batch) >= self.batch_size:
+                break
+            path = os.path.join(self.directory, name)
+            claimed = path[:-len(SPOOL_SUFFIX)] + CLAIM_SUFFIX
+            try:
+                os.rename(path, claimed)
+                os.utime(claimed)  # Claim time, for _release_stale_claims
+                with open(claimed) as f:
+                    batch.append((claimed, json.load(f)))
+            except (OSError, ValueError):
+                continue  # Another worker or process got there first
+        return batch
+
+    def _send_batch(self, batch):
+        app = self.app
+        with app.app_context():
+            pending = list(batch)
+            try:
+                with app.extensions['mail'].connect() as connection:
+                    while pending:
+                        path, entry = pending[0]
+                        started = time.perf_counter()
+                        try:
+                            connection.send(_message(entry))
+                        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                            raise  # Connection is gone: retry the rest of the batch
+                        except Exception as e:
+                            self._retry(path, entry, e)
+                        else:
+                            self._latencies.append(time.perf_counter() - started)
+                            self._count('sent')
+                            os.remove(path)
+                        pending.pop(0)
+            except Exception as e:
+                for path, entry in pending:
+                    self._retry(path, entry, e)
+
+    def _retry(self, path, entry, error):
+        entry['attempts'] += 1
+        entry['last_error'] = repr(error)
+        message_id = os.path.basename(path).split('-', 1)[1][:-len(CLAIM_SUFFIX)]
+        if entry['attempts'] >= self.max_attempts:
+            self._count('failed')
+            self.app.logger.error('Giving up on email %r to %s after %d attempts: %s',
+                                  entry['subject'], entry['recipients'], entry['attempts'], error)
+            self._write(path[:-len(CLAIM_SUFFIX)] + FAILED_SUFFIX, entry)
+        else:
+            self._count('retried')
+            delay = self.retry_delay * 2 ** (entry['attempts'] - 1)
+            self.app.logger.warning('Email %r to %s failed (attempt %d), retrying in %ds: %s',
+                                    entry['subject'], entry['recipients'], entry['attempts'], delay, error)
+            self._write(self._path(time.time() + delay, message_id, SPOOL_SUFFIX), entry)
+        os.remove(path)
+
+
+def _message(entry):
+    sender = entry['sender']
+    return Message(entry['subject'], sender=tuple(sender) if isinstance(sender, list) else sender,
+                   recipients=entry['recipients'], body=entry['body'], html=entry['html'])
 
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
 
 def send_email(subject, sender, recipients, text_body, html_body):
     msg = Message(subject, sender=sender, recipients=recipients)
     msg.body = text_body
     msg.html = html_body
-    Thread(target=send_async_email, 
-           args=(current_app._get_current_object(), msg)).start()
\ No newline at end of file
+    current_app.extensions['mail_queue'].enqueue(msg)
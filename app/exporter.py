@@ -0,0 +1,186 @@
+"""Streaming league export behind `flask games export` and the admin download view.
+
+Every dataset is read through a server-side cursor (yield_per) and written
+out one partition at a time, so memory stays flat however long the history
+is. The results dataset uses the same columns as app/importer.py, so an
+export can be imported into another database unchanged.
+
+Parquet needs pyarrow, which is optional; without it only csv and ndjson
+are offered.
+"""
+import csv
+import importlib.util
+import io
+import json
+from datetime import date
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+from app.models import Player, Deck, GameSession, GameResult, PlayerStats, DeckStats
+
+DATASETS = ('results', 'sessions', 'players', 'decks')
+FORMATS = ('csv', 'ndjson', 'parquet')
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+YIELD_PER = 1000
+
+
+def available_formats():
+    if importlib.util.find_spec('pyarrow') is None:
+        return FORMATS[:2]
+    return FORMATS
+
+
+def _date_range(stmt, start, end):
+    if start is not None:
+        stmt = stmt.where(GameSession.game_date >= start)
+    if end is not None:
+        stmt = stmt.where(GameSession.game_date <= end)
+    return stmt
+
+
+def export_query(dataset, start=None, end=None):
+    """Projected select for one dataset; start/end filter sessions and results by game_date"""
+    if dataset == 'results':
+        player = so.aliased(Player)
+        eliminator = so.aliased(Player)
+        stmt = (
+            sa.select(
+                GameSession.id.label('session'),
+                GameSession.game_date,
+                GameSession.gs_wincon,
+                GameSession.comments,
+                player.player_name.label('player'),
+                Deck.deck_name.label('deck'),
+                GameResult.finish,
+                eliminator.player_name.label('eliminated_by'),
+            )
+            .join(GameResult, GameResult.gr_session_id == GameSession.id)
+            .join(player, GameResult.player_id == player.id)
+            .join(Deck, GameResult.deck_id == Deck.id)
+            .outerjoin(eliminator, GameResult.eliminated_by_id == eliminator.id)
+            .order_by(GameSession.id, GameResult.finish)
+        )
+        return _date_range(stmt, start, end)
+    if dataset == 'sessions':
+        stmt = sa.select(
+            GameSession.id, GameSession.game_date, GameSession.gs_wincon,
+            GameSession.comments, GameSession.player_count
+        ).order_by(GameSession.id)
+        return _date_range(stmt, start, end)
+    if dataset == 'players':
+        return (
+            sa.select(
+                Player.id, Player.player_name,
+                PlayerStats.games, PlayerStats.valid_games, PlayerStats.wins,
+                PlayerStats.eliminations_dealt, PlayerStats.eliminations_received,
+                PlayerStats.last_played,
+            )
+            .outerjoin(PlayerStats, PlayerStats.player_id == Player.id)
+            .order_by(Player.id)
+        )
+    if dataset == 'decks':
+        return (
+            sa.select(
+                Deck.id, Deck.deck_name, Player.player_name.label('owner'), Deck.color_identity_code,
+                DeckStats.games, DeckStats.valid_games, DeckStats.wins,
+                DeckStats.eliminations_dealt, DeckStats.eliminations_received,
+                DeckStats.last_played,
+            )
+            .outerjoin(Player, Deck.owner_id == Player.id)
+            .outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
+            .order_by(Deck.id)
+        )
+    raise ValueError(f'unknown dataset "{dataset}", expected one of {", ".join(DATASETS)}')
+
+
+def export_chunks(dataset, fmt, start=None, end=None):
+    """Bytes chunks of the dataset in fmt, one per cursor partition.
+
+    Arguments are checked before the generator is returned, so callers can
+    report a bad dataset/format before they start a response.
+    """
+    if fmt not in available_formats():
+        raise ValueError(f'unsupported format "{fmt}", expected one of {", ".join(available_formats())}')
+    stmt = export_query(dataset, start, end)
+    writers = {'csv': _csv_chunks, 'ndjson': _ndjson_chunks, 'parquet': _parquet_chunks}
+    return writers[fmt](stmt)
+
+
+def _partitions(stmt):
+    return db.session.execute(stmt.execution_options(yield_per=YIELD_PER)).partitions()
+
+
+def _csv_chunks(stmt):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in stmt.selected_columns])
+    for rows in _partitions(stmt):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _ndjson_chunks(stmt):
+    for rows in _partitions(stmt):
+        yield ''.join(json.dumps(row._asdict(), default=_json_default) + '\n' for row in rows).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file for pyarrow that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _arrow_type(pa, sql_type):
+    if isinstance(sql_type, sa.Integer):
+        return pa.int64()
+    if isinstance(sql_type, sa.Date):
+        return pa.date32()
+    if isinstance(sql_type, (sa.Float, sa.Numeric)):
+        return pa.float64()
+    return pa.string()
+
+
+def _parquet_chunks(stmt):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Schema from the SQL column types, so an all-NULL first partition can't fix a column to null
+    schema = pa.schema([(column.key, _arrow_type(pa, column.type)) for column in stmt.selected_columns])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in _partitions(stmt):
+            # One row group per partition
+            writer.write_table(pa.Table.from_pylist([row._asdict() for row in rows], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
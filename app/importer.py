@@ -0,0 +1,285 @@
+"""Bulk game import behind `flask games import` and the admin upload view.
+
+Files have one row per game result; rows sharing a `session` key (any
+label, only used to group rows) form one game session and must be
+contiguous; a key that comes back after other sessions skips its session:
+
+    session, game_date, gs_wincon, comments, player, deck, finish, eliminated_by
+
+Players and decks are matched by name against maps loaded once up front.
+A session with any bad row is skipped as a whole and every problem is
+reported with its row number. Valid sessions go in chunk_size at a time,
+one transaction per chunk.
+"""
+import codecs
+import csv
+import os
+from datetime import date, datetime
+import sqlalchemy as sa
+from sqlalchemy.exc import SQLAlchemyError
+from openpyxl import load_workbook
+from app import db
+from app.models import Player, Deck, GameSession, GameResult, refresh_derived_stats, bump_data_version
+
+COLUMNS = ('session', 'game_date', 'gs_wincon', 'comments', 'player', 'deck', 'finish', 'eliminated_by')
+REQUIRED_COLUMNS = ('session', 'game_date', 'player', 'deck', 'finish')
+MAX_RESULTS_PER_SESSION = 4
+CHUNK_SIZE = 500
+
+
+class ImportAborted(Exception):
+    """A database error stopped the import; report covers the chunks committed before it"""
+
+    def __init__(self, error, report):
+        super().__init__(str(getattr(error, 'orig', None) or error))
+        self.report = report
+
+
+class ImportReport:
+    """What an import run inserted, skipped and why"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.sessions = 0
+        self.results = 0
+        self.skipped_sessions = 0
+        self.errors = []  # (row number, message)
+
+    def error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def summary(self):
+        verb = 'Validated' if self.dry_run else 'Imported'
+        return (f'{verb} {self.sessions} sessions ({self.results} results); '
+                f'skipped {self.skipped_sessions} sessions with {len(self.errors)} errors.')
+
+
+def read_rows(file, filename):
+    """Yield (row number, {column: value}) from a binary CSV or XLSX file object.
+
+    Rows are read one at a time (csv reader / openpyxl read-only mode), so
+    large files are never held in memory. Raises ValueError for an
+    unsupported extension or a header missing required columns.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    workbook = None
+    if extension == '.csv':
+        rows = csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+    elif extension == '.xlsx':
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    else:
+        raise ValueError(f'unsupported file type "{extension}", expected .csv or .xlsx')
+    try:
+        header = [str(name or '').strip().lower() for name in next(rows, ())]
+        missing = [name for name in REQUIRED_COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f'missing column(s): {", ".join(missing)}')
+        for row_number, values in enumerate(rows, start=2):
+            if all(value is None or str(value).strip() == '' for value in values):
+                continue
+            yield row_number, dict(zip(header, values))
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(_text(value))
+
+
+def _parse_int(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(_text(value))
+
+
+class _NameMap:
+    """name -> value lookups, exact first, then case-insensitive when that is unambiguous"""
+
+    def __init__(self, pairs):
+        self.exact = {}
+        self.folded = {}
+        for name, value in pairs:
+            self.exact[name] = value
+            key = name.casefold()
+            self.folded[key] = None if key in self.folded else value
+
+    def get(self, name):
+        if name in self.exact:
+            return self.exact[name]
+        return self.folded.get(name.casefold())
+
+
+class GameImporter:
+    def __init__(self, chunk_size=CHUNK_SIZE, dry_run=False):
+        self.chunk_size = chunk_size
+        self.report = ImportReport(dry_run)
+        self.players = _NameMap(db.session.execute(sa.select(Player.player_name, Player.id)))
+        self.decks = _NameMap(db.session.execute(sa.select(Deck.deck_name, Deck.id)))
+
+    def run(self, rows):
+        pending = []
+        pending_keys = {}  # session key -> its entry in pending, until the chunk is inserted
+        seen_keys, split_keys, inserted_keys = set(), set(), set()
+        key, group = None, []
+        for row_number, row in rows:
+            row_key = _text(row.get('session'))
+            if not row_key:
+                self.report.error(row_number, 'session is required')
+                continue
+            if row_key != key:
+                self._queue(key, group, pending, pending_keys)
+                key, group = row_key, []
+                if row_key in seen_keys and row_key not in split_keys:
+                    split_keys.add(row_key)
+                    self._withdraw(row_key, row_number, pending, pending_keys, inserted_keys)
+                seen_keys.add(row_key)
+            if row_key in split_keys:
+                continue  # The rest of a split session is dropped with it
+            group.append((row_number, row))
+            if len(pending) >= self.chunk_size:
+                self._insert(pending)
+                inserted_keys.update(pending_keys)
+                pending, pending_keys = [], {}
+        self._queue(key, group, pending, pending_keys)
+        self._insert(pending)
+        return self.report
+
+    def _queue(self, key, group, pending, pending_keys):
+        if not group:
+            return
+        session = self._validate(group)
+        if session is None:
+            self.report.skipped_sessions += 1
+        else:
+            pending.append(session)
+            pending_keys[key] = session
+
+    def _withdraw(self, key, row_number, pending, pending_keys, inserted_keys):
+        """Report a session key that comes back after other sessions and drop the whole session"""
+        message = f'session "{key}" continues after other sessions; keep its rows together'
+        if key in pending_keys:
+            pending.remove(pending_keys.pop(key))
+            self.report.skipped_sessions += 1
+        elif key in inserted_keys:
+            message += ' (its earlier rows went in with a previous chunk; the rest were skipped)'
+        self.report.error(row_number, message)
+
+    def _validate(self, group):
+        """(session values, result rows) for one session, or None after reporting its errors"""
+        errors_before = len(self.report.errors)
+        error = self.report.error
+        first_number, first = group[0]
+        try:
+            game_date = _parse_date(first.get('game_date'))
+        except (TypeError, ValueError):
+            error(first_number, f'game_date "{_text(first.get("game_date"))}" is not a YYYY-MM-DD date')
+            game_date = None
+        if len(group) > MAX_RESULTS_PER_SESSION:
+            error(first_number, f'session has {len(group)} results, at most {MAX_RESULTS_PER_SESSION} allowed')
+
+        results, players_by_name, finishes = [], {}, set()
+        for row_number, row in group:
+            if game_date is not None and _text(row.get('game_date')) and row is not first:
+                try:
+                    if _parse_date(row.get('game_date')) != game_date:
+                        error(row_number, 'game_date differs from the first row of the session')
+                except (TypeError, ValueError):
+                    error(row_number, 'game_date differs from the first row of the session')
+
+            player_name = _text(row.get('player'))
+            player_id = self.players.get(player_name)
+            if player_id is None:
+                error(row_number, f'unknown player "{player_name}"')
+            elif player_id in players_by_name.values():
+                error(row_number, f'player "{player_name}" appears twice in the session')
+            players_by_name[player_name.casefold()] = player_id
+
+            deck_name = _text(row.get('deck'))
+            deck_id = self.decks.get(deck_name)
+            if deck_id is None:
+                error(row_number, f'unknown deck "{deck_name}"')
+
+            try:
+                finish = _parse_int(row.get('finish'))
+            except (TypeError, ValueError):
+                finish = None
+            if finish is None or not 1 <= finish <= MAX_RESULTS_PER_SESSION:
+                error(row_number, f'finish "{_text(row.get("finish"))}" must be 1-{MAX_RESULTS_PER_SESSION}')
+            elif finish in finishes:
+                error(row_number, f'finish {finish} is used twice in the session')
+            finishes.add(finish)
+
+            results.append({'player_id': player_id, 'deck_id': deck_id, 'finish': finish,
+                            'eliminated_by': _text(row.get('eliminated_by')), 'row_number': row_number})
+
+        # Eliminations can only be checked once every player in the session is known
+        for result in results:
+            eliminated_by = result.pop('eliminated_by')
+            row_number = result.pop('row_number')
+            result['eliminated_by_id'] = None
+            if not eliminated_by:
+                continue
+            eliminated_by_id = players_by_name.get(eliminated_by.casefold())
+            if eliminated_by_id is None:
+                error(row_number, f'eliminated_by "{eliminated_by}" did not play in this session')
+            elif eliminated_by_id == result['player_id']:
+                error(row_number, 'a player cannot eliminate themselves')
+            else:
+                result['eliminated_by_id'] = eliminated_by_id
+
+        if len(self.report.errors) > errors_before:
+            return None
+        session = {'game_date': game_date,
+                   'gs_wincon': _text(first.get('gs_wincon')) or None,
+                   'comments': _text(first.get('comments')) or None}
+        return session, results
+
+    def _insert(self, sessions):
+        if not sessions:
+            return
+        if not self.report.dry_run:
+            self._commit(sessions)
+        # Counted once committed, so after a database error the report holds what went in
+        self.report.sessions += len(sessions)
+        self.report.results += sum(len(results) for _, results in sessions)
+
+    def _commit(self, sessions):
+        game_sessions = [GameSession(**values) for values, _ in sessions]
+        db.session.add_all(game_sessions)
+        db.session.flush()
+        db.session.execute(sa.insert(GameResult), [
+            dict(result, gr_session_id=game_session.id)
+            for game_session, (_, results) in zip(game_sessions, sessions)
+            for result in results
+        ])
+        # The results went in as one executemany, past the flush hooks that normally
+        # maintain player_count, the rollups and the data version
+        connection = db.session.connection()
+        refresh_derived_stats(connection, [game_session.id for game_session in game_sessions])
+        bump_data_version(connection)
+        db.session.info['data_version_bumped'] = True
+        db.session.commit()
+
+
+def import_games(rows, chunk_size=CHUNK_SIZE, dry_run=False):
+    """Validate and insert sessions from read_rows(); returns an ImportReport.
+
+    A database error rolls back the failing chunk and is re-raised as
+    ImportAborted, carrying the report of the chunks already committed.
+    """
+    importer = GameImporter(chunk_size=chunk_size, dry_run=dry_run)
+    try:
+        return importer.run(rows)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise ImportAborted(e, importer.report) from e
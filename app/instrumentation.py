@@ -0,0 +1,125 @@
+"""Per-request SQL instrumentation.
+
+Counts statements and DB time for every request via the engine's
+before/after_cursor_execute events, adds a Server-Timing header and
+logs requests that cross the configured thresholds to app.logger
+(the RotatingFileHandler set up in create_app). With
+SQL_DETECT_N_PLUS_ONE on, statements repeated within a request are
+logged as likely N+1 patterns.
+"""
+import heapq
+import time
+from collections import Counter
+from flask import current_app, g, has_app_context, request
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+
+class RequestSQLStats:
+    """Statements run while handling one request"""
+
+    def __init__(self, keep_slowest=5, track_repeats=False):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_time = 0.0
+        self.keep_slowest = keep_slowest
+        self.slowest = []  # min-heap of (seconds, statement)
+        self.repeats = Counter() if track_repeats else None
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, (elapsed, statement))
+        elif self.slowest and elapsed > self.slowest[0][0]:
+            heapq.heappushpop(self.slowest, (elapsed, statement))
+        if self.repeats is not None:
+            self.repeats[statement] += 1
+
+    def slowest_statements(self):
+        return sorted(self.slowest, reverse=True)
+
+    def repeated_statements(self, threshold):
+        if self.repeats is None:
+            return []
+        return [(stmt, n) for stmt, n in self.repeats.most_common() if n >= threshold]
+
+
+def current_sql_stats():
+    """RequestSQLStats for the active request/app context, or None when not instrumented"""
+    if not has_app_context():
+        return None
+    return g.get('_sql_stats')
+
+
+def start_sql_stats(app):
+    """Begin recording statements in the current app context"""
+    g._sql_stats = RequestSQLStats(
+        keep_slowest=app.config.get('SQL_SLOWEST_STATEMENTS', 5),
+        track_repeats=app.config.get('SQL_DETECT_N_PLUS_ONE', False)
+    )
+    return g._sql_stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_time'].pop()
+    stats = current_sql_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+class SQLInstrumentation:
+    """Flask extension wiring the engine events to request hooks"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_INSTRUMENTATION', True):
+            return
+        # Listeners are process-wide; register them once however many apps are created
+        if not sa.event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            sa.event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            sa.event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['sql_instrumentation'] = self
+
+    def _start(self):
+        start_sql_stats(current_app)
+
+    def _finish(self, response):
+        app = current_app
+        stats = current_sql_stats()
+        if stats is None:
+            return response
+        db_ms = stats.total_time * 1000
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+        )
+
+        slow_query_ms = app.config.get('SQL_SLOW_QUERY_MS', 100)
+        slow = [(t, stmt) for t, stmt in stats.slowest_statements() if t * 1000 >= slow_query_ms]
+        if (slow
+                or stats.count > app.config.get('SQL_MAX_QUERIES_PER_REQUEST', 50)
+                or db_ms > app.config.get('SQL_SLOW_REQUEST_MS', 500)):
+            app.logger.warning(
+                'SQL: %s %s ran %d queries in %.1f ms (request %.1f ms); slowest:\n%s',
+                request.method, request.full_path, stats.count, db_ms, total_ms,
+                '\n'.join(f'  {t * 1000:.1f} ms  {" ".join(stmt.split())[:300]}'
+                          for t, stmt in stats.slowest_statements())
+            )
+
+        for statement, n in stats.repeated_statements(app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)):
+            app.logger.warning(
+                'SQL: possible N+1 in %s %s, statement ran %d times: %s',
+                request.method, request.path, n, ' '.join(statement.split())[:300]
+            )
+        return response
@@ -0,0 +1,41 @@
+"""Cached (id, name) choice lists for the game entry and deck forms.
+
+Each list comes from a two-column select and is kept in a per-process
+MemoryCache keyed on the league DataVersion. Every commit that writes a
+Player, Deck or ColorIdentity bumps that version in the same transaction,
+so no worker serves a list from before another worker's write; lists of
+superseded versions fall out of the LRU.
+"""
+import sqlalchemy as sa
+from app import db
+from app.cache import MemoryCache
+from app.models import Player, Deck, ColorIdentity, current_data_version
+
+CHOICES_TTL = 300
+
+_cache = MemoryCache(max_entries=8, ttl=CHOICES_TTL)
+
+
+def _cached(name, stmt):
+    key = (name, current_data_version())
+    choices = _cache.get(key)
+    if choices is None:
+        choices = [tuple(row) for row in db.session.execute(stmt)]
+        _cache.set(key, choices)
+    return choices
+
+
+def player_choices():
+    """[(player id, player name)] ordered by name"""
+    return _cached('players', sa.select(Player.id, Player.player_name).order_by(Player.player_name))
+
+
+def deck_choices():
+    """[(deck id, deck name)] ordered by name"""
+    return _cached('decks', sa.select(Deck.id, Deck.deck_name).order_by(Deck.deck_name))
+
+
+def color_identity_choices():
+    """[(color identity code, identity name)] ordered by name"""
+    return _cached('color_identities',
+                   sa.select(ColorIdentity.code, ColorIdentity.identity_name).order_by(ColorIdentity.identity_name))
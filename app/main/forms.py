@@ -6,6 +6,7 @@ from datetime import date
 import sqlalchemy as sa
 from app import db
 from app.models import User, ColorIdentity, Player
+from app.main.choices import player_choices, color_identity_choices
         
 class PlayerAddForm(FlaskForm):
     player_name = StringField('Player Name', validators=[DataRequired(), Length(max=100)])
@@ -42,13 +43,8 @@ class DeckForm(FlaskForm):
     submit = SubmitField('Add Deck')
 
     def populate_choices(self):
-        # Populate color identity choices dynamically from DB
-        color_identities = db.session.query(ColorIdentity).all()
-        self.color_identity_code.choices = [(ci.code, ci.identity_name) for ci in color_identities]
-        
-        # Populate player choices dynamically
-        players = db.session.query(Player).all()
-        self.owner_id.choices = [(player.id, player.player_name) for player in players]
+        self.color_identity_code.choices = color_identity_choices()
+        self.owner_id.choices = player_choices()
         
         
 
@@ -59,10 +55,8 @@ class DeckEditForm(FlaskForm):
     submit = SubmitField('Save Changes')
     
     def populate_choices(self):
-        color_identities = db.session.query(ColorIdentity).all()
-        self.color_identity_code.choices = [(ci.code, ci.identity_name) for ci in color_identities]
-        players = db.session.query(Player).all()
-        self.owner_id.choices = [(player.id, player.player_name) for player in players]
+        self.color_identity_code.choices = color_identity_choices()
+        self.owner_id.choices = player_choices()
         
 class PlayerEditForm(FlaskForm):
     player_name = StringField('Player Name', validators=[DataRequired(), Length(max=100)])
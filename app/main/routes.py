@@ -1,12 +1,16 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify
-from flask_login import login_required
+import json
+from datetime import date
+from functools import wraps
+from flask import render_template, flash, redirect, url_for, request, jsonify, Response, stream_with_context, abort
+from flask_login import login_required, current_user
 import sqlalchemy as sa
-from sqlalchemy.orm import joinedload
-from app import db
+import sqlalchemy.orm as so
+from app import db, response_cache, mail_queue, rate_limiter, analytics
 from app.main.forms import CombinedGameEntryForm, DeckForm, DeckEditForm, PlayerEditForm, GameSessionEditForm, PlayerAddForm
-from app.models import User, Player, Deck, GameResult, GameSession, ColorIdentity,DeckColor
-from collections import defaultdict
+from app.models import User, Player, Deck, GameResult, GameSession, ColorIdentity, PlayerStats, DeckStats, PlayerRating, DeckRating, COLOR_BITS, current_data_version
 from app.main import bp
+from app.main.tabulator import is_remote_request, paginate
+from app.ratings import INITIAL_RATING
 
 
 @bp.route('/', methods=['GET', 'POST'])
@@ -30,8 +34,18 @@ def player_stats(id):
 #Route for all player stats
 @bp.route('/players')
 def all_player_stats():
-    players = Player.query.order_by(Player.player_name).all()
-    return render_template('player_stats.html', players=players)
+    # Tabulator loads the rows from /api/players; the page itself needs no query
+    return render_template('player_stats.html')
+
+def admin_required(view):
+    """login_required, then 403 for users without the admin flag"""
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if not current_user.is_admin:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
 
 #Route for adding a player
 @bp.route('/add_player', methods=['GET', 'POST'])
@@ -47,6 +61,32 @@ def add_player():
     return render_template('add_player.html', form=form)
 
     
+def _populate_result_choices(form):
+    """Give each nested GameResultForm choices for only its current or submitted ids.
+
+    The selects are filled in the browser from /api/search/*, so the page stays the
+    same size as the league grows; these choices exist to render the chosen option
+    and for SelectField's membership check on submit, so only those ids are looked up.
+    """
+    player_names = _names(Player.id, Player.player_name,
+                          [id for subform in form.results for id in (subform.player_id.data,
+                                                                     subform.eliminated_by_id.data)])
+    deck_names = _names(Deck.id, Deck.deck_name, [subform.deck_id.data for subform in form.results])
+    for subform in form.results:
+        subform.deck_id.choices = [(0, '--- Select Deck ---')] + _known_choice(deck_names, subform.deck_id.data)
+        subform.player_id.choices = [(0, '--- Select Player ---')] + _known_choice(player_names, subform.player_id.data)
+        subform.eliminated_by_id.choices = [(0, '')] + _known_choice(player_names, subform.eliminated_by_id.data)
+
+def _names(id_column, name_column, ids):
+    """{id: name} for the given ids (None/0 for unset selects are skipped), in one query"""
+    ids = {id for id in ids if id}
+    if not ids:
+        return {}
+    return dict(db.session.execute(sa.select(id_column, name_column).where(id_column.in_(ids))).all())
+
+def _known_choice(names, id):
+    return [(id, names[id])] if id in names else []
+
 #Route for add game
 @bp.route('/add_game',methods=['GET','POST'])
 @login_required
@@ -54,17 +94,7 @@ def add_game():
     form = CombinedGameEntryForm()
 
     # Populate choices for nested game result forms
-    decks = Deck.query.all()
-    players = Player.query.all()
-    deck_choices = [(0, '--- Select Deck ---')] + [(deck.id, deck.deck_name) for deck in decks]
-    player_choices = [(0, '--- Select Player ---')] + [(player.id, player.player_name) for player in players]
-    eliminated_by_choices = [(0, '')] + [(player.id, player.player_name) for player in players]
-
-    for subform in form.results:
-        subform.deck_id.choices = deck_choices
-        subform.player_id.choices = player_choices
-        subform.eliminated_by_id.choices = eliminated_by_choices
-    
+    _populate_result_choices(form)
     
     if form.validate_on_submit():
         new_session = GameSession(
@@ -103,32 +133,26 @@ def add_game():
 #Route for all game results
 @bp.route('/game_results')
 def game_results():
-    # For GET or failed POST, fetch game results and render template with form
-    results = GameResult.query.order_by(GameResult.gr_session_id.desc(), GameResult.finish).all()
-    
-    sessions = defaultdict(list)
-    for r in results:
-        sessions[r.gr_session_id].append(r)
-    return render_template('game_log.html', sessions=sessions)
+    """Game log, one page of sessions at a time (same query path as /api/game_sessions)"""
+    start, end = _date_range_args(request.args)
+    stmt = _filter_sessions(sa.select(GameSession.id), start, end).order_by(GameSession.id.desc())
+    pagination = db.paginate(stmt, page=request.args.get('page', 1, type=int),
+                             per_page=GAME_LOG_PAGE_SIZE, error_out=False)
+    sessions = _sessions_with_results(pagination.items)
+    return render_template('game_log.html', sessions=sessions, pagination=pagination,
+                           start=start, end=end)
 
 @bp.route('/decks')
 def all_deck_stats():
-    #decks = Deck.query.order_by(Deck.owner_id).all()
-    decks = (
-        db.session.query(Deck)
-        .options(joinedload(Deck.deck_owner))
-        .join(Player, Deck.owner_id == Player.id)
-        .order_by(Player.player_name)
-        .all()
-    )
-    return render_template('deck_stats.html', decks=decks)
+    # Tabulator loads the rows from /api/decks; the page itself needs no query
+    return render_template('deck_stats.html')
 
 @bp.route('/get_decks_for_player/<int:player_id>')
 @login_required
 def get_decks_for_player(player_id):
-    decks = Deck.query.filter_by(owner_id=player_id).all()
-    deck_list = [{'id': deck.id, 'name': deck.deck_name} for deck in decks]
-    return jsonify(deck_list)
+    # Kept for old clients; same capped, recently-used-first list as /api/search/decks?owner_id=
+    rows = db.session.execute(_deck_search_query(request.args.get('q', ''), SEARCH_MAX, player_id)).all()
+    return jsonify([{'id': row.id, 'name': row.name} for row in rows])
 
 @bp.route('/add_deck', methods=['GET', 'POST'])
 @login_required
@@ -186,19 +210,6 @@ def edit_game_session(session_id):
     session = GameSession.query.get_or_404(session_id)
     form = GameSessionEditForm()
 
-    # Prepare choices for nested forms
-    decks = Deck.query.all()
-    players = Player.query.all()
-    deck_choices = [(0, '--- Select Deck ---')] + [(deck.id, deck.deck_name) for deck in decks]
-    player_choices = [(0, '--- Select Player ---')] + [(player.id, player.player_name) for player in players]
-    eliminated_choices = [(0, '')] + player_choices[1:]
-
-    # Populate choices for each nested game result form in the form field list
-    for subform in form.results:
-        subform.deck_id.choices = deck_choices
-        subform.player_id.choices = player_choices
-        subform.eliminated_by_id.choices = eliminated_choices
-
     if request.method == 'GET':
         # Pre-fill form fields from session and its game results
         form.game_date.data = session.game_date
@@ -216,7 +227,10 @@ def edit_game_session(session_id):
             else:
                 break
 
-    elif form.validate_on_submit():
+    # Populate choices for each nested game result form once the ids are known
+    _populate_result_choices(form)
+
+    if form.validate_on_submit():
         # Update session fields
         session.game_date = form.game_date.data
         session.gs_wincon = form.gs_wincon.data
@@ -244,131 +258,364 @@ def edit_game_session(session_id):
 
 
 
+# Projected stats rows for the JSON APIs
+def _player_stats_query():
+    """(stmt, columns, default_order) for one row per player with rollup stats.
+
+    columns maps Tabulator field names to the SQL expressions they sort/filter on.
+    """
+    columns = {
+        'player_name': Player.player_name,
+        'wins': sa.func.coalesce(PlayerStats.wins, 0),
+        'total_games': sa.func.coalesce(PlayerStats.games, 0),
+        'win_rate': sa.func.coalesce(PlayerStats.win_rate, 0.0),
+        'rating': sa.func.coalesce(PlayerRating.rating, INITIAL_RATING),
+    }
+    stmt = (
+        sa.select(Player.id, *(column.label(field) for field, column in columns.items()))
+        .outerjoin(PlayerStats, PlayerStats.player_id == Player.id)
+        .outerjoin(PlayerRating, PlayerRating.player_id == Player.id)
+    )
+    return stmt, columns, [Player.player_name, Player.id]
+
+def _player_row(row):
+    return {
+        'id': row.id,
+        'player_name': row.player_name,
+        'wins': row.wins,
+        'total_games': row.total_games,
+        'win_rate': float(row.win_rate),  # ✅ Raw decimal 0.42, NOT formatted string
+        'rating': round(row.rating, 1)
+    }
+
+def _deck_stats_query():
+    """(stmt, columns, default_order) for one row per deck with owner, identity and rollup stats"""
+    columns = {
+        'deck_name': Deck.deck_name,
+        'deck_owner': sa.func.coalesce(Player.player_name, 'N/A'),
+        'color_identity': sa.func.coalesce(ColorIdentity.identity_name, Deck.color_identity_code),
+        'wins': sa.func.coalesce(DeckStats.wins, 0),
+        'total_games': sa.func.coalesce(DeckStats.games, 0),
+        'win_rate': sa.func.coalesce(DeckStats.win_rate, 0.0),
+        'rating': sa.func.coalesce(DeckRating.rating, INITIAL_RATING),
+    }
+    stmt = (
+        sa.select(Deck.id, *(column.label(field) for field, column in columns.items()))
+        .outerjoin(Player, Deck.owner_id == Player.id)
+        .outerjoin(ColorIdentity, Deck.color_identity_code == ColorIdentity.code)
+        .outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
+        .outerjoin(DeckRating, DeckRating.deck_id == Deck.id)
+    )
+    return stmt, columns, [Deck.deck_name, Deck.id]
+
+def _deck_row(row):
+    return {
+        'id': row.id,
+        'deck_name': row.deck_name,
+        'color_identity': row.color_identity or '',
+        'deck_owner': row.deck_owner,
+        'wins': row.wins,
+        'total_games': row.total_games,
+        'win_rate': float(row.win_rate),  # ← Raw number (0.42), not percentage string
+        'rating': round(row.rating, 1),
+        'edit_url': url_for('main.edit_deck', deck_id=row.id)
+    }
+
+
 #API routes
+def _tabulator_response(stmt, columns, default_order, serialize):
+    """Full JSON array, or one {last_page, data} page when Tabulator asks for remote paging"""
+    if not is_remote_request(request.args):
+        rows = db.session.execute(stmt.order_by(*default_order)).all()
+        return jsonify([serialize(row) for row in rows])
+    rows, last_page = paginate(stmt, columns, request.args, default_order)
+    return jsonify({'last_page': last_page, 'data': [serialize(row) for row in rows]})
+
+
 @bp.route('/api/players')
+@response_cache.cached
 def api_players():
-    """JSON endpoint for player stats table"""
-    players = Player.query.order_by(Player.player_name).all()
-    return jsonify([{
-        'id': p.id,
-        'player_name': p.player_name,
-        'wins': p.wins,  # Uses @property
-        'total_games': p.total_games,
-        'win_rate': float(p.win_rate)  # ✅ Raw decimal 0.42, NOT formatted string
-    } for p in players])
+    """JSON endpoint for player stats table (reads the player_stats rollup)"""
+    return _tabulator_response(*_player_stats_query(), _player_row)
 
 @bp.route('/api/decks')
+@response_cache.cached
 def api_decks():
-    decks = Deck.query.options(joinedload(Deck.deck_owner)).all()
-    
-    deck_data = []
-    for deck in decks:
-        # Calculate win_rate from GameResult
-        total_games = db.session.query(GameResult).filter_by(deck_id=deck.id).count()
-        wins = db.session.query(GameResult).filter_by(deck_id=deck.id, finish=1).count()
-        win_rate = wins / total_games if total_games > 0 else 0
-        
-        deck_data.append({
-            'id': deck.id,
-            'deck_name': deck.deck_name,
-            'color_identity': getattr(deck.color_identity_rel, 'identity_name', deck.color_identity_code or ''),
-            'deck_owner': deck.deck_owner.player_name if deck.deck_owner else 'N/A',
-            'win_rate': win_rate,  # ← Raw number (0.42), not percentage string
-            'edit_url': url_for('main.edit_deck', deck_id=deck.id)
+    """JSON endpoint for deck stats table (reads the deck_stats rollup)"""
+    return _tabulator_response(*_deck_stats_query(), _deck_row)
+
+LEADERBOARD_LIMIT = 25
+LEADERBOARD_MAX = 200
+
+@bp.route('/api/leaderboard')
+@response_cache.cached
+def api_leaderboard():
+    """Highest rated players (or ?entity=decks) with at least ?min_games= rated games"""
+    entity = request.args.get('entity', 'players')
+    limit = min(max(request.args.get('limit', LEADERBOARD_LIMIT, type=int), 1), LEADERBOARD_MAX)
+    min_games = max(request.args.get('min_games', 1, type=int), 1)
+    if entity == 'decks':
+        stmt = sa.select(Deck.id, Deck.deck_name.label('name'), DeckRating.rating, DeckRating.games)\
+            .join(DeckRating, DeckRating.deck_id == Deck.id)
+        rating = DeckRating
+    elif entity == 'players':
+        stmt = sa.select(Player.id, Player.player_name.label('name'), PlayerRating.rating, PlayerRating.games)\
+            .join(PlayerRating, PlayerRating.player_id == Player.id)
+        rating = PlayerRating
+    else:
+        return jsonify({'error': 'entity must be players or decks'}), 400
+    rows = db.session.execute(
+        stmt.where(rating.games >= min_games).order_by(rating.rating.desc(), 'name').limit(limit)
+    ).all()
+    return jsonify([{
+        'rank': rank,
+        'id': row.id,
+        'name': row.name,
+        'rating': round(row.rating, 1),
+        'games': row.games
+    } for rank, row in enumerate(rows, start=1)])
+
+# Typeahead lookups for the game entry forms
+SEARCH_LIMIT = 10
+SEARCH_MAX = 50
+
+def _search_args(args):
+    return args.get('q', '').strip(), min(max(args.get('limit', SEARCH_LIMIT, type=int), 1), SEARCH_MAX)
+
+def _rank_matches(stmt, name, last_played, q, limit):
+    """Names containing q, prefix matches first, then most recently played, then alphabetical"""
+    if q:
+        stmt = stmt.where(name.icontains(q, autoescape=True))\
+            .order_by(sa.case((name.istartswith(q, autoescape=True), 0), else_=1))
+    return stmt.order_by(last_played.is_(None), last_played.desc(), name).limit(limit)
+
+def _player_search_query(q, limit):
+    stmt = sa.select(Player.id, Player.player_name.label('name'))\
+        .outerjoin(PlayerStats, PlayerStats.player_id == Player.id)
+    return _rank_matches(stmt, Player.player_name, PlayerStats.last_played, q, limit)
+
+def _deck_search_query(q, limit, owner_id=None):
+    stmt = sa.select(Deck.id, Deck.deck_name.label('name'), Deck.owner_id)\
+        .outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
+    if owner_id:
+        stmt = stmt.where(Deck.owner_id == owner_id)
+    return _rank_matches(stmt, Deck.deck_name, DeckStats.last_played, q, limit)
+
+@bp.route('/api/search/players')
+@response_cache.cached
+def api_search_players():
+    """Player typeahead: ?q=&limit="""
+    rows = db.session.execute(_player_search_query(*_search_args(request.args))).all()
+    return jsonify([{'id': row.id, 'name': row.name} for row in rows])
+
+@bp.route('/api/search/decks')
+@response_cache.cached
+def api_search_decks():
+    """Deck typeahead: ?q=&limit=&owner_id= (owner_id scopes to one player's decks)"""
+    q, limit = _search_args(request.args)
+    rows = db.session.execute(_deck_search_query(q, limit, request.args.get('owner_id', type=int))).all()
+    return jsonify([{'id': row.id, 'name': row.name, 'owner_id': row.owner_id} for row in rows])
+
+
+SESSION_PAGE_LIMIT = 50
+SESSION_PAGE_MAX = 500
+STREAM_YIELD_PER = 1000
+GAME_LOG_PAGE_SIZE = 50
+
+def _date_range_args(args):
+    """Optional ?start=&end= (YYYY-MM-DD) filters on GameSession.game_date"""
+    def parse(name):
+        try:
+            return date.fromisoformat(args.get(name, ''))
+        except ValueError:
+            return None
+    return parse('start'), parse('end')
+
+def _filter_sessions(stmt, start=None, end=None):
+    """Sessions that have results, optionally within a date range"""
+    stmt = stmt.where(GameSession.player_count > 0)
+    if start is not None:
+        stmt = stmt.where(GameSession.game_date >= start)
+    if end is not None:
+        stmt = stmt.where(GameSession.game_date <= end)
+    return stmt
+
+def _session_results_query():
+    """Projected session + result rows, newest session first, results by finish"""
+    eliminator = so.aliased(Player)
+    return (
+        sa.select(
+            GameSession.id.label('session_id'),
+            GameSession.game_date,
+            GameSession.gs_wincon,
+            GameResult.finish,
+            Player.player_name,
+            Deck.deck_name,
+            eliminator.player_name.label('eliminated_by')
+        )
+        .join(GameResult, GameResult.gr_session_id == GameSession.id)
+        .join(Player, GameResult.player_id == Player.id)
+        .join(Deck, GameResult.deck_id == Deck.id)
+        .outerjoin(eliminator, GameResult.eliminated_by_id == eliminator.id)
+        .order_by(GameSession.id.desc(), GameResult.finish)
+    )
+
+def _group_sessions(rows):
+    """Yield one session dict per run of consecutive rows with the same session_id"""
+    current = None
+    for row in rows:
+        if current is None or current['session_id'] != row.session_id:
+            if current is not None:
+                yield current
+            current = {
+                'session_id': row.session_id,
+                'date': row.game_date.strftime('%Y-%m-%d') if row.game_date else '',
+                'wincon': row.gs_wincon or '',
+                'results': []
+            }
+        current['results'].append({
+            'finish': row.finish,
+            'player': row.player_name or '',
+            'deck': row.deck_name or '',
+            'eliminated_by': row.eliminated_by or ''
         })
-    return jsonify(deck_data)
+    if current is not None:
+        yield current
+
+def _sessions_with_results(session_ids):
+    """Session dicts (newest first) with their results, fetched in one query"""
+    if not session_ids:
+        return []
+    return list(_group_sessions(db.session.execute(
+        _session_results_query().where(GameSession.id.in_(session_ids))
+    )))
+
+def _stream_sessions(fmt, start=None, end=None):
+    """Generator over a server-side cursor, so a full export never sits in memory"""
+    rows = db.session.execute(
+        _filter_sessions(_session_results_query(), start, end)
+        .execution_options(yield_per=STREAM_YIELD_PER)
+    )
+    if fmt == 'ndjson':
+        for session in _group_sessions(rows):
+            yield json.dumps(session) + '\n'
+        return
+    yield '['
+    for i, session in enumerate(_group_sessions(rows)):
+        yield (',' if i else '') + json.dumps(session)
+    yield ']'
 
 @bp.route('/api/game_sessions')
+@response_cache.cached
 def api_game_sessions():
-    """JSON endpoint for game results/sessions"""
-    results = GameResult.query.options(
-        joinedload(GameResult.gr_session),
-        joinedload(GameResult.player),
-        joinedload(GameResult.deck),
-        joinedload(GameResult.eliminated_by)
-    ).order_by(GameResult.gr_session_id.desc(), GameResult.finish).all()
-    
-    sessions = {}
-    for r in results:
-        session_id = r.gr_session_id
-        if session_id not in sessions:
-            sessions[session_id] = {
-                'session_id': session_id,
-                'date': r.gr_session.game_date.strftime('%Y-%m-%d') if r.gr_session else '',
-                'wincon': r.gr_session.gs_wincon or '',
-                'results': []
-            }
-        sessions[session_id]['results'].append({
-            'finish': r.finish,
-            'player': r.player.player_name if r.player else '',
-            'deck': r.deck.deck_name if r.deck else '',
-            'eliminated_by': r.eliminated_by.player_name if r.eliminated_by else ''
+    """JSON endpoint for game results/sessions.
+
+    ?page=&size= (Tabulator remote mode), ?after_session_id=&limit= (keyset),
+    ?stream=ndjson|json (chunked full export), otherwise the full array.
+    All modes accept ?start=&end= date filters.
+    """
+    start, end = _date_range_args(request.args)
+    stream = request.args.get('stream')
+    if stream in ('ndjson', 'json'):
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        return Response(stream_with_context(_stream_sessions(stream, start, end)), mimetype=mimetype)
+
+    stmt = _filter_sessions(
+        sa.select(GameSession.id, GameSession.game_date, GameSession.gs_wincon), start, end
+    )
+    default_order = [GameSession.id.desc()]
+
+    if is_remote_request(request.args):
+        columns = {
+            'session_id': GameSession.id,
+            'date': GameSession.game_date,
+            'wincon': GameSession.gs_wincon,
+        }
+        sessions, last_page = paginate(stmt, columns, request.args, default_order)
+        data = _sessions_with_results([s.id for s in sessions])
+        return jsonify({'last_page': last_page, 'data': data})
+
+    if 'after_session_id' in request.args or 'limit' in request.args:
+        # Keyset seek on the primary key: cost is independent of how deep the page is
+        limit = min(max(request.args.get('limit', SESSION_PAGE_LIMIT, type=int), 1), SESSION_PAGE_MAX)
+        after_session_id = request.args.get('after_session_id', type=int)
+        if after_session_id is not None:
+            stmt = stmt.where(GameSession.id < after_session_id)
+        session_ids = db.session.scalars(
+            stmt.with_only_columns(GameSession.id).order_by(*default_order).limit(limit)
+        ).all()
+        return jsonify({
+            'data': _sessions_with_results(session_ids),
+            'next_after_session_id': session_ids[-1] if len(session_ids) == limit else None
         })
-    
-    return jsonify(list(sessions.values()))
 
+    return jsonify(list(_group_sessions(db.session.execute(
+        _filter_sessions(_session_results_query(), start, end)
+    ))))
 
-@bp.route('/api/dashboard/kpis')
-def api_dashboard_kpis():
-    """Single endpoint for all dashboard KPIs"""
-    # Total games
-    total_games = db.session.query(sa.func.count(GameResult.id)).scalar() or 0
-    
-    # Unique players with games
-    player_count = db.session.query(sa.func.count(sa.distinct(GameResult.player_id))).scalar() or 0
-    
-    # Average winrate
-    avg_winrate = db.session.query(
-        sa.func.avg((GameResult.finish == 1).cast(sa.Float))
-    ).filter(GameResult.finish.isnot(None)).scalar() or 0
-    
-    # ✅ FIXED: Group by both ID and name
-    top_deck_result = db.session.query(
-        Deck.id,
-        Deck.deck_name, 
-        sa.func.count(GameResult.id).label('wins')
-    ).join(GameResult, Deck.id == GameResult.deck_id)\
-     .filter(GameResult.finish == 1)\
-     .group_by(Deck.id, Deck.deck_name)\
-     .order_by(sa.desc('wins')).first()
-    
-    top_deck_wins = top_deck_result.wins if top_deck_result else 0
-    top_deck_name = top_deck_result.deck_name if top_deck_result else 'None'
-    
-    # Total decks
-    total_decks = Deck.query.count() or 0
-    
-    return jsonify({
-        'total_games': total_games,
-        'player_count': player_count,
-        'avg_winrate': float(avg_winrate),
-        'top_deck_wins': top_deck_wins,
-        'top_deck_name': top_deck_name,
-        'total_decks': total_decks
-    })
 
-# 1st Chart: WUBRG from DeckColor (SINGLE COLORS)
-@bp.route('/api/dashboard/colors')
-def api_dashboard_colors():
-    """WUBRG from Deck → DeckColor → ColorIdentity (SINGLE COLORS)"""
+def _dashboard_kpis():
+    """All dashboard KPIs from the stats rollups, in one statement"""
+    top_deck = (
+        sa.select(Deck.deck_name, DeckStats.wins)
+        .join(DeckStats, DeckStats.deck_id == Deck.id)
+        .where(DeckStats.wins > 0)
+        .order_by(DeckStats.wins.desc())
+        .limit(1)
+        .subquery()
+    )
+    totals = db.session.execute(
+        sa.select(
+            sa.func.coalesce(sa.func.sum(PlayerStats.games), 0).label('total_games'),
+            sa.func.count(PlayerStats.player_id).filter(PlayerStats.games > 0).label('player_count'),
+            sa.func.coalesce(sa.func.sum(PlayerStats.wins), 0).label('wins'),
+            sa.func.coalesce(sa.func.sum(PlayerStats.valid_games), 0).label('valid_games'),
+            sa.select(top_deck.c.deck_name).scalar_subquery().label('top_deck_name'),
+            sa.select(top_deck.c.wins).scalar_subquery().label('top_deck_wins'),
+            sa.select(sa.func.count(Deck.id)).scalar_subquery().label('total_decks')
+        )
+    ).one()
+
+    # Average winrate over valid (4+ player) games
+    avg_winrate = totals.wins / totals.valid_games if totals.valid_games else 0
+    return {
+        'total_games': totals.total_games,
+        'player_count': totals.player_count,
+        'avg_winrate': float(avg_winrate),
+        'top_deck_wins': totals.top_deck_wins or 0,
+        'top_deck_name': totals.top_deck_name or 'None',
+        'total_decks': totals.total_decks or 0
+    }
+
+def _dashboard_colors():
+    """WUBRG deck counts from Deck.color_mask (SINGLE COLORS)"""
+    # color_identity is six rows; each is matched to decks by its bit, so deck_colors is never read
+    bit = sa.case(COLOR_BITS, value=ColorIdentity.code)
     color_data = db.session.query(
         ColorIdentity.code,
         ColorIdentity.identity_name,
-        sa.func.count(DeckColor.id).label('count')
-    ).join(DeckColor, ColorIdentity.code == DeckColor.color_id)\
-     .join(Deck, DeckColor.deck_id == Deck.id)\
-     .filter(ColorIdentity.code.in_(['W', 'U', 'B', 'R', 'G', 'C']))\
+        sa.func.count(Deck.id).label('count')
+    ).join(Deck, Deck.color_mask.bitwise_and(bit) != 0)\
+     .filter(ColorIdentity.code.in_(list(COLOR_BITS)))\
      .group_by(ColorIdentity.code, ColorIdentity.identity_name)\
      .order_by(sa.desc('count')).all()
     
-    return jsonify([{
+    return [{
         'color': c.code,
         'name': c.identity_name,
         'count': c.count  # Remove int() wrapper
-    } for c in color_data])
-
-@bp.route('/api/dashboard/commander-identities')
-def api_dashboard_commander_identities():
+    } for c in color_data]
+
+def _dashboard_color_counts():
+    """Decks per number of WUBRG colors (0-5), in one pass over deck"""
+    rows = db.session.execute(
+        sa.select(Deck.color_count.label('colors'), sa.func.count(Deck.id).label('count'))
+        .group_by('colors')
+        .order_by('colors')
+    ).all()
+    return [{'colors': row.colors, 'count': row.count} for row in rows]
+
+def _dashboard_commander_identities():
     """Commander identities from Deck.color_identity_code (with fallback)"""
     identity_data = db.session.query(
         Deck.color_identity_code.label('code'),
@@ -379,8 +626,172 @@ def api_dashboard_commander_identities():
      .group_by(Deck.color_identity_code, ColorIdentity.identity_name)\
      .order_by(sa.desc('count')).all()
     
-    return jsonify([{
+    return [{
         'color': row.code,
         'name': row.name,
         'count': row.count  # No int() needed
-    } for row in identity_data])
+    } for row in identity_data]
+
+def _dashboard_top_players(limit=10):
+    """Top players by win rate (then wins) from the player_stats rollup"""
+    rows = db.session.execute(
+        sa.select(
+            Player.id,
+            Player.player_name,
+            PlayerStats.wins,
+            PlayerStats.games,
+            PlayerStats.win_rate.label('win_rate')
+        )
+        .join(PlayerStats, PlayerStats.player_id == Player.id)
+        .where(PlayerStats.games > 0)
+        .order_by(sa.desc('win_rate'), PlayerStats.wins.desc(), Player.player_name)
+        .limit(limit)
+    ).all()
+    return [{
+        'id': row.id,
+        'player_name': row.player_name,
+        'wins': row.wins,
+        'total_games': row.games,
+        'win_rate': float(row.win_rate)
+    } for row in rows]
+
+
+@bp.route('/api/dashboard')
+@response_cache.cached
+def api_dashboard():
+    """Everything the index page needs in one payload, revalidated by data version"""
+    version = current_data_version()
+    etag = f'dashboard-{version}'
+    if etag in request.if_none_match:
+        # Nothing was written since the browser's copy: skip every stats query
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'data_version': version,
+            'kpis': _dashboard_kpis(),
+            'players': _dashboard_top_players(),
+            'colors': _dashboard_colors(),
+            'commander_identities': _dashboard_commander_identities()
+        })
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/api/dashboard/kpis')
+@response_cache.cached
+def api_dashboard_kpis():
+    """Single endpoint for all dashboard KPIs (reads the stats rollups)"""
+    return jsonify(_dashboard_kpis())
+
+# 1st Chart: WUBRG from Deck.color_mask (SINGLE COLORS)
+@bp.route('/api/dashboard/colors')
+@response_cache.cached
+def api_dashboard_colors():
+    """WUBRG deck counts from Deck.color_mask (SINGLE COLORS)"""
+    return jsonify(_dashboard_colors())
+
+@bp.route('/api/dashboard/color-counts')
+@response_cache.cached
+def api_dashboard_color_counts():
+    """Histogram of decks by color count from Deck.color_mask"""
+    return jsonify(_dashboard_color_counts())
+
+@bp.route('/api/dashboard/commander-identities')
+@response_cache.cached
+def api_dashboard_commander_identities():
+    """Commander identities from Deck.color_identity_code (with fallback)"""
+    return jsonify(_dashboard_commander_identities())
+
+def _analytics_response(table):
+    return Response(analytics.to_json(table), mimetype='application/json')
+
+@bp.route('/api/analytics/players')
+@response_cache.cached
+def api_analytics_players():
+    """Per-player games, wins, win rate, average finish and eliminations"""
+    return _analytics_response(analytics.get_analytics().players)
+
+@bp.route('/api/analytics/decks')
+@response_cache.cached
+def api_analytics_decks():
+    """Per-deck games, wins, win rate and average finish"""
+    return _analytics_response(analytics.get_analytics().decks)
+
+@bp.route('/api/analytics/colors')
+@response_cache.cached
+def api_analytics_colors():
+    """Per color identity games, wins, win rate and deck count"""
+    return _analytics_response(analytics.get_analytics().colors)
+
+@bp.route('/api/analytics/pod-sizes')
+@response_cache.cached
+def api_analytics_pod_sizes():
+    """Per player and pod size win rate against the 1/pod size baseline"""
+    return _analytics_response(analytics.get_analytics().pod_sizes)
+
+@bp.route('/api/analytics/form')
+@response_cache.cached
+def api_analytics_form():
+    """Form over the last ?games=N (default 10) games; ?player_id= gives that player's rolling series"""
+    games = min(max(request.args.get('games', analytics.FORM_GAMES, type=int), 1), analytics.FORM_MAX_GAMES)
+    league = analytics.get_analytics()
+    player_id = request.args.get('player_id', type=int)
+    if player_id is not None:
+        return _analytics_response(league.player_form(player_id, games))
+    return _analytics_response(league.form(games))
+
+@bp.route('/api/analytics/eliminations')
+@response_cache.cached
+def api_analytics_eliminations():
+    """Who eliminates whom: matrix[i][j] = times players[i] eliminated players[j]"""
+    league = analytics.get_analytics()
+    return jsonify({
+        'players': league.player_index,
+        'matrix': league.eliminations.tolist()
+    })
+
+@bp.route('/api/analytics/head-to-head')
+@response_cache.cached
+def api_analytics_head_to_head():
+    """Shared pods: meetings[i][j] games together, ahead[i][j] times players[i] finished above players[j]"""
+    league = analytics.get_analytics()
+    meetings, ahead = league.head_to_head
+    return jsonify({
+        'players': league.player_index,
+        'meetings': meetings.tolist(),
+        'ahead': ahead.tolist()
+    })
+
+@bp.route('/api/analytics/timeseries')
+@response_cache.cached
+def api_analytics_timeseries():
+    """?metric=games|win_rate|color_usage&entity=league|player:<id>|deck:<id>|color:<code>&bucket=day|week|month"""
+    start, end = _date_range_args(request.args)
+    try:
+        series = analytics.timeseries(
+            request.args.get('metric', 'games'),
+            request.args.get('entity', 'league'),
+            request.args.get('bucket', 'week'),
+            start, end
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(series)
+
+@bp.route('/api/cache/stats')
+@admin_required
+def api_cache_stats():
+    """Hit/miss counters for the API response cache (not cached itself)"""
+    return jsonify(response_cache.stats())
+
+@bp.route('/api/mail/stats')
+@admin_required
+def api_mail_stats():
+    """Outbound email queue depth, counters and send latency (not cached)"""
+    return jsonify(mail_queue.stats())
+
+@bp.route('/api/ratelimit/stats')
+@admin_required
+def api_ratelimit_stats():
+    """Allowed/limited counts per auth rate limit (not cached)"""
+    return jsonify(rate_limiter.stats())
@@ -0,0 +1,85 @@
+"""Helpers for Tabulator's remote pagination/sort/filter mode.
+
+Tabulator sends page, size, sort[i][field|dir] and filter[i][field|type|value]
+query args; these are pushed down into the SQL statement as ORDER BY,
+WHERE and LIMIT/OFFSET so a request only ever reads one page of rows.
+"""
+import math
+import re
+import sqlalchemy as sa
+from app import db
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 25
+
+_INDEXED_ARG = re.compile(r'^(\w+)\[(\d+)\]\[(\w+)\]$')
+
+_FILTER_OPERATORS = {
+    '=': lambda col, value: col == value,
+    '!=': lambda col, value: col != value,
+    '<': lambda col, value: col < value,
+    '<=': lambda col, value: col <= value,
+    '>': lambda col, value: col > value,
+    '>=': lambda col, value: col >= value,
+    'like': lambda col, value: col.ilike(f'%{value}%'),
+    'starts': lambda col, value: col.ilike(f'{value}%'),
+    'ends': lambda col, value: col.ilike(f'%{value}'),
+}
+
+
+def is_remote_request(args):
+    """True when the caller asked for a page instead of the full table"""
+    return 'page' in args
+
+
+def indexed_args(args, name):
+    """Collect name[0][key]=value style args into a list of dicts, in index order"""
+    items = {}
+    for key, value in args.items(multi=True):
+        match = _INDEXED_ARG.match(key)
+        if match and match.group(1) == name:
+            items.setdefault(int(match.group(2)), {})[match.group(3)] = value
+    return [items[i] for i in sorted(items)]
+
+
+def apply_filters(stmt, columns, args):
+    """WHERE clauses for filter[] args on known columns; unknown fields/types are ignored"""
+    for item in indexed_args(args, 'filter'):
+        column = columns.get(item.get('field'))
+        operator = _FILTER_OPERATORS.get(item.get('type', 'like'))
+        value = item.get('value')
+        if column is None or operator is None or value in (None, ''):
+            continue
+        stmt = stmt.where(operator(column, value))
+    return stmt
+
+
+def apply_sorters(stmt, columns, args, default_order):
+    """ORDER BY for sort[] args on known columns, falling back to default_order.
+
+    default_order is always appended so ties break the same way on every page.
+    """
+    order = []
+    for item in indexed_args(args, 'sort'):
+        column = columns.get(item.get('field'))
+        if column is None:
+            continue
+        order.append(column.desc() if item.get('dir') == 'desc' else column.asc())
+    return stmt.order_by(*order, *default_order)
+
+
+def paginate(stmt, columns, args, default_order):
+    """Run one page of stmt and return (rows, last_page) for a Tabulator response"""
+    stmt = apply_filters(stmt, columns, args)
+    size = min(max(args.get('size', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    page = max(args.get('page', 1, type=int), 1)
+
+    total = db.session.scalar(
+        sa.select(sa.func.count()).select_from(stmt.order_by(None).subquery())
+    ) or 0
+    rows = db.session.execute(
+        apply_sorters(stmt, columns, args, default_order)
+        .limit(size)
+        .offset((page - 1) * size)
+    ).all()
+    return rows, max(math.ceil(total / size), 1)
@@ -1,14 +1,18 @@
+from collections import defaultdict
+from itertools import chain, groupby
 from datetime import date, datetime, timezone
 from typing import Optional
 import sqlalchemy as sa
 import sqlalchemy.orm as so
 from sqlalchemy import Table
+from sqlalchemy.ext.hybrid import hybrid_property
 from flask_login import UserMixin
-from flask import current_app
+from flask import current_app, session as flask_session
 from werkzeug.security import generate_password_hash, check_password_hash
 from time import time
 import jwt
 from app import db, login
+from app.ratings import INITIAL_RATING, pod_deltas
 
 
 class User(UserMixin, db.Model):
@@ -48,9 +52,55 @@ class User(UserMixin, db.Model):
             return
         return db.session.get(User, id)
 
+class SessionUser(UserMixin):
+    """current_user rebuilt from the signed session cookie instead of a user query (see load_user)"""
+
+    def __init__(self, profile):
+        self.id = profile['id']
+        self.username = profile['username']
+        self.is_admin = profile['is_admin']
+        self.player_id = profile['player_id']
+
+    @property
+    def player(self):
+        return db.session.get(Player, self.player_id) if self.player_id is not None else None
+
+    def __repr__(self):
+        return '<SessionUser {}>'.format(self.username)
+
+
+# Changes to these bump the data version, so every worker reloads cached session users
+_USER_PROFILE_COLUMNS = ('username', 'email', 'password_hash', 'is_admin', 'player_id')
+
+
 @login.user_loader
 def load_user(id):
-    return db.session.get(User, int(id))
+    """Trust the session's copy of the user while the data version it was read at is current.
+
+    A write to a user's profile columns bumps the version in its own transaction,
+    so every worker reloads the user on its next request. USER_CACHE_TTL bounds
+    how long a copy is trusted at all (for changes made outside the ORM); a TTL
+    of 0 always queries.
+    """
+    id = int(id)
+    version = current_data_version()
+    profile = flask_session.get('user_profile')
+    if (profile and profile['id'] == id and profile.get('version') == version and
+            time() - profile['at'] < current_app.config.get('USER_CACHE_TTL', 60)):
+        return SessionUser(profile)
+    user = db.session.get(User, id)
+    if user is None:
+        flask_session.pop('user_profile', None)
+        return None
+    flask_session['user_profile'] = {
+        'id': user.id,
+        'username': user.username,
+        'is_admin': bool(user.is_admin),
+        'player_id': user.player_id,
+        'version': version,
+        'at': time()
+    }
+    return user
 
 
 class Player(db.Model):
@@ -71,11 +121,24 @@ class Player(db.Model):
     #one-to-many relationship to decks owned by this player
     decks: so.Mapped[list["Deck"]] = so.relationship("Deck", back_populates="deck_owner", cascade="all, delete-orphan")
     
-    __table_args__ = (sa.Index('ix_player_player_name', 'player_name'),)
-    
-    @property
+    # Filled in by Player.with_stats() or PlayerAdmin so list views can read stats without walking games
+    _wins: so.Mapped[Optional[int]] = so.query_expression()
+    _total_games: so.Mapped[Optional[int]] = so.query_expression()
+    _total_valid_games: so.Mapped[Optional[int]] = so.query_expression()
+
+    @classmethod
+    def with_stats(cls):
+        """Loader options that compute wins/total_games/total_valid_games in the same SELECT"""
+        return [
+            so.with_expression(cls._wins, cls.wins),
+            so.with_expression(cls._total_games, cls.total_games),
+            so.with_expression(cls._total_valid_games, cls.total_valid_games),
+        ]
+
+    @hybrid_property
     def wins(self):
-        #return sum(1 for game in self.games if game.finish == 1)
+        if self._wins is not None:
+            return self._wins
         # Only count games won (finish == 1) where total players in the session >= 4
         return sum(
             1
@@ -83,36 +146,76 @@ class Player(db.Model):
             if (
                 game.finish == 1 and
                 game.gr_session is not None and
-                len(game.gr_session.results) >= 4
+                game.gr_session.is_valid
             )
         )
+
+    @wins.inplace.expression
+    @classmethod
+    def _wins_expression(cls):
+        return _game_count(GameResult.player_id, cls.id, valid_only=True, wins_only=True)
     
-    @property
+    @hybrid_property
     def total_games(self):
+        if self._total_games is not None:
+            return self._total_games
         return len(self.games)
+
+    @total_games.inplace.expression
+    @classmethod
+    def _total_games_expression(cls):
+        return _game_count(GameResult.player_id, cls.id)
     
-    @property
+    @hybrid_property
     def total_valid_games(self):
+        if self._total_valid_games is not None:
+            return self._total_valid_games
         return sum(
             1
             for game in self.games
             if (
                 game.gr_session is not None and
-                len(game.gr_session.results) >= 4
+                game.gr_session.is_valid
             )
         )
+
+    @total_valid_games.inplace.expression
+    @classmethod
+    def _total_valid_games_expression(cls):
+        return _game_count(GameResult.player_id, cls.id, valid_only=True)
     
-    @property
+    @hybrid_property
     def win_rate(self):
-        return (self.wins / self.total_valid_games) if self.total_valid_games > 10 else 0
+        total_valid_games = self.total_valid_games
+        return (self.wins / total_valid_games) if total_valid_games > 10 else 0
+
+    @win_rate.inplace.expression
+    @classmethod
+    def _win_rate_expression(cls):
+        return _win_rate(cls.wins, cls.total_valid_games, min_games=10)
 
     def __repr__(self):
         return f"<Player {self.player_name}>"
 
+# Deck.color_mask bit per DeckColor.color_id
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16, 'C': 32}
+WUBRG_MASK = 31
+
+
+def color_mask(codes):
+    """Bitmask for an iterable of color codes, e.g. color_mask('UR') == 10"""
+    mask = 0
+    for code in codes:
+        mask |= COLOR_BITS[code]
+    return mask
+
+
 class ColorIdentity(db.Model):
     __tablename__ = 'color_identity'
     code: so.Mapped[str] = so.mapped_column(sa.String(5), primary_key=True)
     identity_name: so.Mapped[str] = so.mapped_column(sa.String(20), nullable=False)
+    # Filled in by ColorIdentityAdmin so its list doesn't load deck_colors per row
+    deck_count: so.Mapped[Optional[int]] = so.query_expression()
     
     deck_colors: so.Mapped[list["DeckColor"]] = so.relationship(
         "DeckColor", back_populates="color"
@@ -155,46 +258,115 @@ class Deck(db.Model):
     
     games: so.Mapped[list["GameResult"]] = so.relationship("GameResult", back_populates="deck")
         
-    @property
+    # COLOR_BITS of the deck's DeckColor rows, maintained by the flush hooks below
+    color_mask: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0,
+                                                  server_default='0', index=True)
+
+    @hybrid_property
     def color_count(self) -> int:
-        """Number of colors in this deck (1-5)"""
-        return len(self.colors)
-    
-    @property
+        """Number of WUBRG colors in this deck (1-5)"""
+        return bin(self.color_mask & WUBRG_MASK).count('1')
+
+    @color_count.inplace.expression
+    @classmethod
+    def _color_count_expression(cls):
+        return sum(
+            sa.case((cls.color_mask.bitwise_and(bit) != 0, 1), else_=0)
+            for code, bit in COLOR_BITS.items() if code != 'C'
+        )
+
+    @hybrid_property
     def is_five_color(self) -> bool:
         """True if deck uses all 5 colors"""
-        return self.color_count == 5
+        return self.color_mask & WUBRG_MASK == WUBRG_MASK
+
+    @is_five_color.inplace.expression
+    @classmethod
+    def _is_five_color_expression(cls):
+        return cls.color_mask.bitwise_and(WUBRG_MASK) == WUBRG_MASK
+
+    @classmethod
+    def has_colors(cls, codes):
+        """Decks containing every color in codes ("decks with blue": has_colors('U'))"""
+        mask = color_mask(codes)
+        return cls.color_mask.bitwise_and(mask) == mask
+
+    @classmethod
+    def exactly_colors(cls, codes):
+        """Decks with exactly these colors ("exactly Izzet": exactly_colors('UR')), served by the index"""
+        return cls.color_mask == color_mask(codes)
     
-    @property
-    def wins(self):    
+    # Filled in by Deck.with_stats() or DeckAdmin so list views can read stats without walking games
+    _wins: so.Mapped[Optional[int]] = so.query_expression()
+    _total_games: so.Mapped[Optional[int]] = so.query_expression()
+    _total_valid_games: so.Mapped[Optional[int]] = so.query_expression()
+
+    @classmethod
+    def with_stats(cls):
+        """Loader options that compute wins/total_games/total_valid_games in the same SELECT"""
+        return [
+            so.with_expression(cls._wins, cls.wins),
+            so.with_expression(cls._total_games, cls.total_games),
+            so.with_expression(cls._total_valid_games, cls.total_valid_games),
+        ]
+
+    @hybrid_property
+    def wins(self):
+        if self._wins is not None:
+            return self._wins
         return sum(
                 1
                 for game in self.games
                 if (
                     game.finish == 1 and
                     game.gr_session is not None and
-                    len(game.gr_session.results) >= 4
+                    game.gr_session.is_valid
                 )
             )
+
+    @wins.inplace.expression
+    @classmethod
+    def _wins_expression(cls):
+        return _game_count(GameResult.deck_id, cls.id, valid_only=True, wins_only=True)
     
-    @property
+    @hybrid_property
     def total_games(self):
+        if self._total_games is not None:
+            return self._total_games
         return len(self.games)
+
+    @total_games.inplace.expression
+    @classmethod
+    def _total_games_expression(cls):
+        return _game_count(GameResult.deck_id, cls.id)
     
-    @property
+    @hybrid_property
     def total_valid_games(self):
+        if self._total_valid_games is not None:
+            return self._total_valid_games
         return sum(
             1
             for game in self.games
             if (
                 game.gr_session is not None and
-                len(game.gr_session.results) >= 4
+                game.gr_session.is_valid
             )
         )
+
+    @total_valid_games.inplace.expression
+    @classmethod
+    def _total_valid_games_expression(cls):
+        return _game_count(GameResult.deck_id, cls.id, valid_only=True)
     
-    @property
+    @hybrid_property
     def win_rate(self):
-        return (self.wins / self.total_valid_games) if self.total_valid_games > 0 else 0
+        total_valid_games = self.total_valid_games
+        return (self.wins / total_valid_games) if total_valid_games > 0 else 0
+
+    @win_rate.inplace.expression
+    @classmethod
+    def _win_rate_expression(cls):
+        return _win_rate(cls.wins, cls.total_valid_games, min_games=0)
 
     def __repr__(self):
         return f"<Deck {self.deck_name} ({self.color_identity_rel})>"
@@ -205,27 +377,677 @@ class GameSession(db.Model):
     game_date: so.Mapped[date] = so.mapped_column(sa.Date, nullable=False, default=lambda: date.today())
     gs_wincon: so.Mapped[str] = so.mapped_column(sa.Text, nullable=True)
     comments: so.Mapped[str] = so.mapped_column(sa.Text, nullable=True)
+    # Denormalized len(results), maintained by the flush hooks below
+    player_count: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0,
+                                                    server_default='0', index=True)
     
     results: so.Mapped[list["GameResult"]] = so.relationship("GameResult", back_populates="gr_session", cascade="all, delete-orphan")
 
+    @hybrid_property
+    def is_valid(self):
+        """Only sessions with 4+ players count towards wins and win rates"""
+        return self.player_count >= 4
+
     def __repr__(self):
         return f"<GameSession {self.id} on {self.game_date}>"
 
 class GameResult(db.Model):
     __tablename__ = 'game_result'
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
-    gr_session_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('game_session.id'), nullable=False, index=True)
-    player_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id'), nullable=False, index=True)
-    deck_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('deck.id'), nullable=False, index=True)
+    # active_history: the flush hooks need the previous session/player/deck of an edited result
+    gr_session_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('game_session.id'), nullable=False, index=True,
+                                                     active_history=True)
+    player_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id'), nullable=False, index=True,
+                                                 active_history=True)
+    deck_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('deck.id'), nullable=False, index=True,
+                                               active_history=True)
     finish: so.Mapped[int] = so.mapped_column(nullable=False)
-    eliminated_by_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id'), nullable=True)
+    eliminated_by_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id'), nullable=True,
+                                                        active_history=True)
     eliminated_by: so.Mapped['Player'] = so.relationship('Player', foreign_keys=[eliminated_by_id])
     
-    gr_session: so.Mapped["GameSession"] = so.relationship("GameSession", back_populates="results")
+    gr_session: so.Mapped["GameSession"] = so.relationship("GameSession", back_populates="results",
+                                                          active_history=True)
     player: so.Mapped["Player"] = so.relationship("Player", back_populates="games", foreign_keys=[player_id])
     deck: so.Mapped["Deck"] = so.relationship("Deck", back_populates="games")
 
     def __repr__(self):
         return (f"<GameResult {self.id} | Session: {self.gr_session_id} | Player: {self.player.player_name} | "
                 f"Deck: {self.deck.deck_name} | Placement: {self.finish} | Eliminated By: "
-                f"{self.eliminated_by.player_name if self.eliminated_by else 'N/A'}>")
\ No newline at end of file
+                f"{self.eliminated_by.player_name if self.eliminated_by else 'N/A'}>")
+
+
+def _game_count(owner_column, owner_id, valid_only=False, wins_only=False):
+    """Correlated COUNT of GameResult rows where owner_column (player_id/deck_id) == owner_id.
+
+    valid_only keeps games from sessions with at least 4 players, wins_only keeps finish == 1.
+    """
+    result = so.aliased(GameResult)
+    stmt = sa.select(sa.func.count(result.id)).where(
+        getattr(result, owner_column.key) == owner_id
+    )
+    if wins_only:
+        stmt = stmt.where(result.finish == 1)
+    if valid_only:
+        pod = so.aliased(GameSession)
+        stmt = stmt.join(pod, pod.id == result.gr_session_id).where(pod.is_valid)
+    return stmt.scalar_subquery()
+
+
+def _win_rate(wins, total_valid_games, min_games):
+    """SQL win rate, 0 unless there are more than min_games valid games"""
+    return sa.case(
+        (total_valid_games > min_games, sa.cast(wins, sa.Float) / total_valid_games),
+        else_=0.0
+    )
+
+
+class PlayerStats(db.Model):
+    """Per-player rollup of game_result, refreshed in the transaction that writes the games"""
+    __tablename__ = 'player_stats'
+    player_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id', ondelete='CASCADE'), primary_key=True)
+    games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    valid_games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    wins: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    eliminations_dealt: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    eliminations_received: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    last_played: so.Mapped[Optional[date]] = so.mapped_column(sa.Date, nullable=True)
+
+    @hybrid_property
+    def win_rate(self):
+        return (self.wins / self.valid_games) if self.valid_games > 10 else 0
+
+    @win_rate.inplace.expression
+    @classmethod
+    def _win_rate_expression(cls):
+        return _win_rate(cls.wins, cls.valid_games, min_games=10)
+
+    def __repr__(self):
+        return f"<PlayerStats {self.player_id}: {self.wins}/{self.valid_games}>"
+
+class DeckStats(db.Model):
+    """Per-deck rollup of game_result, refreshed in the transaction that writes the games"""
+    __tablename__ = 'deck_stats'
+    deck_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('deck.id', ondelete='CASCADE'), primary_key=True)
+    games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    valid_games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    wins: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    eliminations_dealt: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    eliminations_received: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    last_played: so.Mapped[Optional[date]] = so.mapped_column(sa.Date, nullable=True)
+
+    @hybrid_property
+    def win_rate(self):
+        return (self.wins / self.valid_games) if self.valid_games > 0 else 0
+
+    @win_rate.inplace.expression
+    @classmethod
+    def _win_rate_expression(cls):
+        return _win_rate(cls.wins, cls.valid_games, min_games=0)
+
+    def __repr__(self):
+        return f"<DeckStats {self.deck_id}: {self.wins}/{self.valid_games}>"
+
+
+class DailyStats(db.Model):
+    """Per-day counts of game_result, refreshed for the days a transaction touched.
+
+    dimension/key: ('league', '') counts sessions; ('player', id), ('deck', id) and
+    ('color', color identity code) count results. Coarser buckets are summed from these.
+    """
+    __tablename__ = 'daily_stats'
+    day: so.Mapped[date] = so.mapped_column(sa.Date, primary_key=True)
+    dimension: so.Mapped[str] = so.mapped_column(sa.String(10), primary_key=True)
+    key: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+    games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    valid_games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    wins: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        sa.Index('ix_daily_stats_dimension_key_day', 'dimension', 'key', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<DailyStats {self.day} {self.dimension}:{self.key} {self.wins}/{self.games}>"
+
+
+class PlayerRating(db.Model):
+    """Current multiplayer Elo rating per player (see app/ratings.py); no row until the first game"""
+    __tablename__ = 'player_rating'
+    player_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id', ondelete='CASCADE'), primary_key=True)
+    rating: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False, default=INITIAL_RATING)
+    games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<PlayerRating {self.player_id}: {self.rating:.0f}>"
+
+class DeckRating(db.Model):
+    """Current multiplayer Elo rating per deck; no row until the first game"""
+    __tablename__ = 'deck_rating'
+    deck_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('deck.id', ondelete='CASCADE'), primary_key=True)
+    rating: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False, default=INITIAL_RATING)
+    games: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DeckRating {self.deck_id}: {self.rating:.0f}>"
+
+class RatingHistory(db.Model):
+    """Ratings before/after each rated seat, in the (game_date, session_id) order sessions were rated.
+
+    session_id is deliberately not a foreign key: rows of a deleted or re-dated session must
+    survive the flush so update_ratings can see where to replay from.
+    """
+    __tablename__ = 'rating_history'
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    session_id: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, index=True)
+    game_date: so.Mapped[date] = so.mapped_column(sa.Date, nullable=False)
+    player_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('player.id', ondelete='CASCADE'), index=True)
+    deck_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('deck.id', ondelete='CASCADE'), index=True)
+    finish: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False)
+    player_rating_before: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False)
+    player_rating_after: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False)
+    deck_rating_before: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False)
+    deck_rating_after: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False)
+
+    __table_args__ = (
+        sa.Index('ix_rating_history_game_date_session_id', 'game_date', 'session_id'),
+    )
+
+    def __repr__(self):
+        return (f"<RatingHistory session {self.session_id} player {self.player_id}: "
+                f"{self.player_rating_before:.0f} -> {self.player_rating_after:.0f}>")
+
+
+class DataVersion(db.Model):
+    """Single-row counter bumped in every transaction that changes league data.
+
+    Cheap to read, so HTTP validators (ETags) and caches can key on it instead of re-running stats queries.
+    """
+    __tablename__ = 'data_version'
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    version: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DataVersion {self.version}>"
+
+
+def current_data_version():
+    """Current league data version (0 before the first write)"""
+    return db.session.scalar(sa.select(DataVersion.version).where(DataVersion.id == 1)) or 0
+
+
+def bump_data_version(connection):
+    """Increment the data version inside the caller's transaction"""
+    table = DataVersion.__table__
+    updated = connection.execute(
+        table.update().where(table.c.id == 1).values(version=table.c.version + 1)
+    )
+    if updated.rowcount == 0:
+        connection.execute(table.insert().values(id=1, version=1))
+
+
+def update_player_counts(connection, session_ids):
+    """Recount GameSession.player_count for the given session ids"""
+    if not session_ids:
+        return
+    game_session = GameSession.__table__
+    game_result = GameResult.__table__
+    connection.execute(
+        game_session.update()
+        .where(game_session.c.id.in_(session_ids))
+        .values(player_count=(
+            sa.select(sa.func.count(game_result.c.id))
+            .where(game_result.c.gr_session_id == game_session.c.id)
+            .scalar_subquery()
+        ))
+    )
+
+
+def refresh_color_masks(connection, deck_ids=None):
+    """Recompute Deck.color_mask from deck_colors for deck_ids (all decks when None)"""
+    if deck_ids is not None and not deck_ids:
+        return
+    deck = Deck.__table__
+    deck_colors = DeckColor.__table__
+    # uq_deck_color makes the sum of distinct bits the same as OR-ing them
+    update = deck.update().values(color_mask=sa.func.coalesce(
+        sa.select(sa.func.sum(sa.case(COLOR_BITS, value=deck_colors.c.color_id, else_=0)))
+        .where(deck_colors.c.deck_id == deck.c.id)
+        .scalar_subquery(),
+        0
+    ))
+    if deck_ids is not None:
+        update = update.where(deck.c.id.in_(deck_ids))
+    connection.execute(update)
+
+
+def _rollup_columns(result, session):
+    """Aggregates shared by player_stats and deck_stats, over `result` joined to `session`"""
+    valid = session.c.player_count >= 4
+    return [
+        sa.func.count(result.c.id),
+        sa.func.count(sa.case((valid, result.c.id))),
+        sa.func.count(sa.case((sa.and_(valid, result.c.finish == 1), result.c.id))),
+        sa.func.count(result.c.eliminated_by_id),
+        sa.func.max(session.c.game_date),
+    ]
+
+
+def refresh_player_stats(connection, player_ids=None):
+    """Recompute player_stats rows for player_ids (all players when None)"""
+    if player_ids is not None and not player_ids:
+        return
+    player = Player.__table__
+    stats = PlayerStats.__table__
+    result = GameResult.__table__.alias('result')
+    session = GameSession.__table__.alias('session')
+    victim = GameResult.__table__.alias('victim')
+    games, valid_games, wins, received, last_played = _rollup_columns(result, session)
+    dealt = (
+        sa.select(sa.func.count(victim.c.id))
+        .where(victim.c.eliminated_by_id == player.c.id)
+        .scalar_subquery()
+    )
+    select = (
+        sa.select(player.c.id, games, valid_games, wins, dealt, received, last_played)
+        .select_from(
+            player.outerjoin(result, result.c.player_id == player.c.id)
+            .outerjoin(session, session.c.id == result.c.gr_session_id)
+        )
+        .group_by(player.c.id)
+    )
+    delete = stats.delete()
+    if player_ids is not None:
+        select = select.where(player.c.id.in_(player_ids))
+        delete = delete.where(stats.c.player_id.in_(player_ids))
+    connection.execute(delete)
+    connection.execute(stats.insert().from_select(
+        ['player_id', 'games', 'valid_games', 'wins', 'eliminations_dealt',
+         'eliminations_received', 'last_played'],
+        select
+    ))
+
+
+def refresh_deck_stats(connection, deck_ids=None):
+    """Recompute deck_stats rows for deck_ids (all decks when None)"""
+    if deck_ids is not None and not deck_ids:
+        return
+    deck = Deck.__table__
+    stats = DeckStats.__table__
+    result = GameResult.__table__.alias('result')
+    session = GameSession.__table__.alias('session')
+    pilot = GameResult.__table__.alias('pilot')
+    victim = GameResult.__table__.alias('victim')
+    games, valid_games, wins, received, last_played = _rollup_columns(result, session)
+    # Eliminations made by whoever piloted this deck, in the sessions it was played
+    dealt = (
+        sa.select(sa.func.count(victim.c.id))
+        .select_from(pilot.join(victim, sa.and_(
+            victim.c.gr_session_id == pilot.c.gr_session_id,
+            victim.c.eliminated_by_id == pilot.c.player_id
+        )))
+        .where(pilot.c.deck_id == deck.c.id)
+        .scalar_subquery()
+    )
+    select = (
+        sa.select(deck.c.id, games, valid_games, wins, dealt, received, last_played)
+        .select_from(
+            deck.outerjoin(result, result.c.deck_id == deck.c.id)
+            .outerjoin(session, session.c.id == result.c.gr_session_id)
+        )
+        .group_by(deck.c.id)
+    )
+    delete = stats.delete()
+    if deck_ids is not None:
+        select = select.where(deck.c.id.in_(deck_ids))
+        delete = delete.where(stats.c.deck_id.in_(deck_ids))
+    connection.execute(delete)
+    connection.execute(stats.insert().from_select(
+        ['deck_id', 'games', 'valid_games', 'wins', 'eliminations_dealt',
+         'eliminations_received', 'last_played'],
+        select
+    ))
+
+
+def refresh_daily_stats(connection, days=None):
+    """Recompute daily_stats rows for the given game dates (every day when None)"""
+    if days is not None:
+        days = set(days) - {None}
+        if not days:
+            return
+    stats = DailyStats.__table__
+    session = GameSession.__table__.alias('session')
+    result = GameResult.__table__.alias('result')
+    deck = Deck.__table__.alias('deck')
+    valid = session.c.player_count >= 4
+    columns = ['day', 'dimension', 'key', 'games', 'valid_games', 'wins']
+
+    def in_days(select):
+        return select if days is None else select.where(session.c.game_date.in_(days))
+
+    league = in_days(
+        sa.select(session.c.game_date, sa.literal('league'), sa.literal(''),
+                  sa.func.count(session.c.id), sa.func.count(sa.case((valid, session.c.id))), sa.literal(0))
+        .where(session.c.player_count > 0)
+        .group_by(session.c.game_date)
+    )
+    results = session.join(result, result.c.gr_session_id == session.c.id)
+    counts = [
+        sa.func.count(result.c.id),
+        sa.func.count(sa.case((valid, result.c.id))),
+        sa.func.count(sa.case((sa.and_(valid, result.c.finish == 1), result.c.id))),
+    ]
+    by_player = in_days(
+        sa.select(session.c.game_date, sa.literal('player'), sa.cast(result.c.player_id, sa.String), *counts)
+        .select_from(results)
+        .group_by(session.c.game_date, result.c.player_id)
+    )
+    by_deck = in_days(
+        sa.select(session.c.game_date, sa.literal('deck'), sa.cast(result.c.deck_id, sa.String), *counts)
+        .select_from(results)
+        .group_by(session.c.game_date, result.c.deck_id)
+    )
+    by_color = in_days(
+        sa.select(session.c.game_date, sa.literal('color'), deck.c.color_identity_code, *counts)
+        .select_from(results.join(deck, deck.c.id == result.c.deck_id))
+        .group_by(session.c.game_date, deck.c.color_identity_code)
+    )
+
+    delete = stats.delete()
+    if days is not None:
+        delete = delete.where(stats.c.day.in_(days))
+    connection.execute(delete)
+    for select in (league, by_player, by_deck, by_color):
+        connection.execute(stats.insert().from_select(columns, select))
+
+
+def refresh_derived_stats(connection, session_ids, player_ids=(), deck_ids=(), days=()):
+    """Bring player_count, the rollups, ratings and daily_stats up to date after game_result rows changed.
+
+    Everyone who played in (or eliminated someone in) the touched sessions is refreshed,
+    since a changed player_count can flip whether their games are valid. days adds game
+    dates the sessions no longer have (moved or deleted sessions).
+    """
+    session_ids = set(session_ids) - {None}
+    player_ids = set(player_ids)
+    deck_ids = set(deck_ids)
+    days = set(days)
+    if session_ids:
+        update_player_counts(connection, session_ids)
+        game_session = GameSession.__table__
+        days.update(connection.execute(
+            sa.select(game_session.c.game_date).where(game_session.c.id.in_(session_ids)).distinct()
+        ).scalars())
+        result = GameResult.__table__
+        for player_id, eliminated_by_id, deck_id in connection.execute(
+            sa.select(result.c.player_id, result.c.eliminated_by_id, result.c.deck_id)
+            .where(result.c.gr_session_id.in_(session_ids))
+        ):
+            player_ids.update((player_id, eliminated_by_id))
+            deck_ids.add(deck_id)
+        update_ratings(connection, session_ids)
+    refresh_player_stats(connection, player_ids - {None})
+    refresh_deck_stats(connection, deck_ids - {None})
+    refresh_daily_stats(connection, days)
+
+
+def _at_or_after(date_column, id_column, position):
+    """(date_column, id_column) >= position, spelled out for databases without row values"""
+    game_date, session_id = position
+    return sa.or_(date_column > game_date, sa.and_(date_column == game_date, id_column >= session_id))
+
+
+def _restored_ratings(connection, id_column, after_column, ids):
+    """{id: [rating, games]} from the newest remaining rating_history row of each id"""
+    if not ids:
+        return {}
+    history = RatingHistory.__table__
+    ranked = (
+        sa.select(
+            id_column.label('id'),
+            after_column.label('rating'),
+            sa.func.count().over(partition_by=id_column).label('games'),
+            sa.func.row_number().over(
+                partition_by=id_column,
+                order_by=(history.c.game_date.desc(), history.c.session_id.desc())
+            ).label('newest')
+        )
+        .where(id_column.in_(ids))
+        .subquery()
+    )
+    restored = {id: [INITIAL_RATING, 0] for id in ids}
+    for row in connection.execute(sa.select(ranked.c.id, ranked.c.rating, ranked.c.games)
+                                  .where(ranked.c.newest == 1)):
+        restored[row.id] = [row.rating, row.games]
+    return restored
+
+
+def _write_ratings(connection, table, key, ratings, ids=None):
+    """Replace rating rows for ids (every row when None) with ratings {id: [rating, games]}"""
+    delete = table.delete()
+    if ids is not None:
+        if not ids:
+            return
+        delete = delete.where(table.c[key].in_(ids))
+    connection.execute(delete)
+    rows = [{key: id, 'rating': rating, 'games': games}
+            for id, (rating, games) in ratings.items() if (ids is None or id in ids) and games]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def replay_ratings(connection, start=None):
+    """Re-rate sessions from position start = (game_date, session id) onward; None replays all.
+
+    Ratings are first restored to what they were just before start from rating_history,
+    then every later session is rated again in order. When nothing has been rated at or
+    after start yet (the usual new-game case) that is just the new sessions.
+    """
+    history = RatingHistory.__table__
+    player_rating = PlayerRating.__table__
+    deck_rating = DeckRating.__table__
+    game_session = GameSession.__table__
+    game_result = GameResult.__table__
+
+    touched_players, touched_decks = set(), set()
+    if start is None:
+        connection.execute(history.delete())
+        players, decks = {}, {}
+        sessions = sa.true()
+    else:
+        sessions = _at_or_after(game_session.c.game_date, game_session.c.id, start)
+        # Current ratings of just the players/decks seated from start on: one pod for a new game
+        seated = sa.select(game_result.c.player_id, game_result.c.deck_id)\
+            .join(game_session, game_result.c.gr_session_id == game_session.c.id).where(sessions).subquery()
+        players = {row.player_id: [row.rating, row.games] for row in connection.execute(
+            sa.select(player_rating).where(player_rating.c.player_id.in_(sa.select(seated.c.player_id))))}
+        decks = {row.deck_id: [row.rating, row.games] for row in connection.execute(
+            sa.select(deck_rating).where(deck_rating.c.deck_id.in_(sa.select(seated.c.deck_id))))}
+        later = _at_or_after(history.c.game_date, history.c.session_id, start)
+        for player_id, deck_id in connection.execute(sa.select(history.c.player_id, history.c.deck_id).where(later)):
+            touched_players.add(player_id)
+            touched_decks.add(deck_id)
+        if touched_players:
+            connection.execute(history.delete().where(later))
+            players.update(_restored_ratings(connection, history.c.player_id,
+                                             history.c.player_rating_after, touched_players))
+            decks.update(_restored_ratings(connection, history.c.deck_id,
+                                           history.c.deck_rating_after, touched_decks))
+
+    seats = connection.execute(
+        sa.select(game_session.c.id, game_session.c.game_date, game_result.c.player_id,
+                  game_result.c.deck_id, game_result.c.finish)
+        .join(game_result, game_result.c.gr_session_id == game_session.c.id)
+        .where(sessions)
+        .order_by(game_session.c.game_date, game_session.c.id, game_result.c.finish)
+        .execution_options(yield_per=1000)
+    )
+    history_rows = []
+    for _, pod in groupby(seats, key=lambda seat: seat.id):
+        pod = list(pod)
+        if len(pod) < 2:
+            continue
+        finishes = [seat.finish for seat in pod]
+        player_before = [players.setdefault(seat.player_id, [INITIAL_RATING, 0])[0] for seat in pod]
+        deck_before = [decks.setdefault(seat.deck_id, [INITIAL_RATING, 0])[0] for seat in pod]
+        player_deltas = pod_deltas(player_before, finishes)
+        deck_deltas = pod_deltas(deck_before, finishes)
+        for seat, p_before, p_delta, d_before, d_delta in zip(pod, player_before, player_deltas,
+                                                              deck_before, deck_deltas):
+            players[seat.player_id] = [p_before + p_delta, players[seat.player_id][1] + 1]
+            decks[seat.deck_id] = [d_before + d_delta, decks[seat.deck_id][1] + 1]
+            touched_players.add(seat.player_id)
+            touched_decks.add(seat.deck_id)
+            history_rows.append({
+                'session_id': seat.id, 'game_date': seat.game_date, 'player_id': seat.player_id,
+                'deck_id': seat.deck_id, 'finish': seat.finish,
+                'player_rating_before': p_before, 'player_rating_after': p_before + p_delta,
+                'deck_rating_before': d_before, 'deck_rating_after': d_before + d_delta,
+            })
+    if history_rows:
+        connection.execute(history.insert(), history_rows)
+    _write_ratings(connection, player_rating, 'player_id', players, None if start is None else touched_players)
+    _write_ratings(connection, deck_rating, 'deck_id', decks, None if start is None else touched_decks)
+
+
+def update_ratings(connection, session_ids):
+    """Re-rate after the given sessions were added, edited or deleted.
+
+    Replays from the earliest position any of them holds now or held when last rated,
+    so a new game costs one pod and only edits to old games replay later history.
+    """
+    session_ids = set(session_ids) - {None}
+    if not session_ids:
+        return
+    game_session = GameSession.__table__
+    history = RatingHistory.__table__
+    positions = connection.execute(
+        sa.select(game_session.c.game_date, game_session.c.id).where(game_session.c.id.in_(session_ids))
+        .union(sa.select(history.c.game_date, history.c.session_id).where(history.c.session_id.in_(session_ids)))
+    ).all()
+    if positions:
+        replay_ratings(connection, min(tuple(position) for position in positions))
+
+
+_RESULT_KEYS = ('gr_session_id', 'player_id', 'deck_id', 'eliminated_by_id')
+# Result attributes the rollups, player_count, ratings and daily_stats read
+_RESULT_STAT_ATTRS = _RESULT_KEYS + ('gr_session', 'finish')
+
+# Writes to these models change what the stats pages and APIs return
+_VERSIONED_MODELS = (Player, Deck, DeckColor, ColorIdentity, GameSession, GameResult)
+
+
+def _persisted_values(obj, key):
+    """Current value of a column attribute plus the one it replaced, if any"""
+    history = sa.inspect(obj).attrs[key].history
+    return {getattr(obj, key), *history.deleted}
+
+
+def _has_changes(obj, keys):
+    """Whether a dirty object really changed any of the given attributes"""
+    attrs = sa.inspect(obj).attrs
+    return any(attrs[key].history.has_changes() for key in keys)
+
+
+@sa.event.listens_for(so.Session, 'before_flush')
+def _collect_touched_results(session, flush_context, instances):
+    # Old values have to be read before the flush overwrites them
+    touched = session.info.setdefault('touched', defaultdict(set))
+    pending_results = session.info.setdefault('pending_results', set())
+    pending_results.update(obj for obj in session.new if isinstance(obj, GameResult))
+    for obj in chain(session.dirty, session.deleted):
+        dirty = obj not in session.deleted
+        if isinstance(obj, GameResult):
+            # Edits that leave every stat input as it was (a resubmitted form) change nothing derived
+            if dirty and not _has_changes(obj, _RESULT_STAT_ATTRS):
+                continue
+            for key in _RESULT_KEYS:
+                touched[key].update(_persisted_values(obj, key))
+            touched['gr_session_id'].update(
+                s.id for s in sa.inspect(obj).attrs.gr_session.history.deleted if s is not None
+            )
+            if dirty:
+                pending_results.add(obj)
+        elif isinstance(obj, GameSession):
+            # Only game_date feeds the stats (last_played, ratings order, daily buckets)
+            if dirty and not _has_changes(obj, ('game_date',)):
+                continue
+            if dirty:
+                touched['gr_session_id'].add(obj.id)
+            touched['game_date'].update(_persisted_values(obj, 'game_date'))
+        elif isinstance(obj, Deck) and dirty and \
+                sa.inspect(obj).attrs.color_identity_code.history.has_changes():
+            touched['recolored_deck_id'].add(obj.id)
+        elif isinstance(obj, DeckColor):
+            touched['deck_color_deck_id'].update(_persisted_values(obj, 'deck_id'))
+    session.info.setdefault('pending_deck_colors', set()).update(
+        obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, DeckColor)
+    )
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _refresh_touched_stats(session, flush_context):
+    touched = session.info.pop('touched', defaultdict(set))
+    # Foreign keys of new/moved results are only known once the flush has run
+    for obj in session.info.pop('pending_results', set()):
+        for key in _RESULT_KEYS:
+            touched[key].add(getattr(obj, key))
+    touched['deck_color_deck_id'].update(
+        obj.deck_id for obj in session.info.pop('pending_deck_colors', set())
+    )
+    deck_color_ids = touched.pop('deck_color_deck_id') - {None}
+    if deck_color_ids:
+        refresh_color_masks(session.connection(), deck_color_ids)
+        session.info['stale_decks'] = deck_color_ids
+    if not any(touched.values()):
+        return
+    connection = session.connection()
+    days = touched['game_date']
+    if touched['recolored_deck_id']:
+        # Every day the deck was played moves to another color bucket
+        days.update(connection.execute(
+            sa.select(GameSession.game_date).join(GameResult, GameResult.gr_session_id == GameSession.id)
+            .where(GameResult.deck_id.in_(touched['recolored_deck_id'])).distinct()
+        ).scalars())
+    refresh_derived_stats(
+        connection,
+        touched['gr_session_id'],
+        player_ids=touched['player_id'] | touched['eliminated_by_id'],
+        deck_ids=touched['deck_id'],
+        days=days
+    )
+    session.info['stale_sessions'] = touched['gr_session_id'] - {None}
+
+
+@sa.event.listens_for(so.Session, 'after_flush_postexec')
+def _expire_touched_sessions(session, flush_context):
+    mapper = sa.inspect(GameSession)
+    for session_id in session.info.pop('stale_sessions', set()):
+        game_session = session.identity_map.get(mapper.identity_key_from_primary_key((session_id,)))
+        if game_session is not None:
+            session.expire(game_session, ['player_count'])
+    mapper = sa.inspect(Deck)
+    for deck_id in session.info.pop('stale_decks', set()):
+        deck = session.identity_map.get(mapper.identity_key_from_primary_key((deck_id,)))
+        if deck is not None:
+            session.expire(deck, ['color_mask'])
+
+
+@sa.event.listens_for(so.Session, 'before_flush')
+def _flag_data_change(session, flush_context, instances):
+    if any(
+        isinstance(obj, _VERSIONED_MODELS) and (obj not in session.dirty or session.is_modified(obj))
+        for obj in chain(session.new, session.dirty, session.deleted)
+    ) or any(
+        # Expires the session copies load_user keeps
+        isinstance(obj, User) and (obj in session.deleted or _has_changes(obj, _USER_PROFILE_COLUMNS))
+        for obj in chain(session.dirty, session.deleted)
+    ):
+        session.info['data_changed'] = True
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _bump_data_version(session, flush_context):
+    if session.info.pop('data_changed', False):
+        bump_data_version(session.connection())
+        session.info['data_version_bumped'] = True  # Read by the response cache on commit
@@ -0,0 +1,213 @@
+"""Token bucket rate limiting for the auth endpoints.
+
+Each named limit in RATELIMIT_LIMITS is (burst, per_seconds): a bucket
+holds up to `burst` tokens and refills at burst/per_seconds tokens a
+second. A POST takes one token from each bucket it is keyed on (client
+IP, then the submitted username or email) and is refused with 429 and
+Retry-After as soon as one is empty. Views call throttle() before
+validating the form, so a refused request never reaches the database,
+check_password_hash or the mail queue.
+
+Backends:
+  memory  per-process buckets (each gunicorn worker allows its own burst)
+  sqlite  buckets and counters in one SQLite file (RATELIMIT_DB, default
+          instance/ratelimit.sqlite) shared by every worker on the host
+  null    limiting disabled
+
+The per-IP limits key on request.remote_addr. Behind a reverse proxy that
+is the proxy's address, so every client would share one bucket and a
+single attacker could lock everyone out of login: set PROXY_FIX_HOPS to
+the number of trusted proxies in front of the app, and create_app() wraps
+it in werkzeug's ProxyFix to read the client address from
+X-Forwarded-For. Leave it at 0 when clients connect directly, or they
+can pick their own address with that header.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from flask import render_template, request
+
+DEFAULT_LIMITS = {
+    'login_ip': (20, 60),
+    'login_user': (5, 300),
+    'reset_ip': (5, 600),
+    'reset_email': (3, 3600),
+}
+
+
+def _refill(tokens, updated, now, burst, rate):
+    """(tokens after taking one or None when empty, seconds until a token is available, time the bucket is full)"""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        tokens -= 1
+        wait = 0.0
+    else:
+        wait = (1 - tokens) / rate
+    return tokens, wait, now + (burst - tokens) / rate
+
+
+class NullBuckets:
+    def take(self, limit, key, burst, per_seconds):
+        return 0.0
+
+    def count(self, limit, outcome):
+        pass
+
+    def counters(self):
+        return {}
+
+    def __len__(self):
+        return 0
+
+
+class MemoryBuckets:
+    """Thread-safe LRU dict of (tokens, updated, full_at) per (limit, key), at most max_entries long"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def take(self, limit, key, burst, per_seconds):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.pop((limit, key), (burst, now, now))
+            tokens, wait, full_at = _refill(tokens, updated, now, burst, burst / per_seconds)
+            self._buckets[(limit, key)] = (tokens, now, full_at)
+            if len(self._buckets) > self.max_entries:
+                # O(1): drop the least recently used bucket, usually long since refilled
+                self._buckets.popitem(last=False)
+            return wait
+
+    def count(self, limit, outcome):
+        with self._lock:
+            self._counters[limit, outcome] += 1
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file, updated under BEGIN IMMEDIATE so workers never race on a bucket"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS bucket ('
+                       'name TEXT, key TEXT, tokens REAL, updated REAL, full_at REAL, PRIMARY KEY (name, key))')
+            db.execute('CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)')
+            db.execute('CREATE TABLE IF NOT EXISTS counter ('
+                       'name TEXT, outcome TEXT, n INTEGER, PRIMARY KEY (name, outcome))')
+
+    def _connect(self):
+        # One short-lived connection per call: auth requests are rare and threads can't share one
+        db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        return _Closing(db)
+
+    def take(self, limit, key, burst, per_seconds):
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT tokens, updated FROM bucket WHERE name = ? AND key = ?',
+                             (limit, key)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens, wait, full_at = _refill(tokens, updated, now, burst, burst / per_seconds)
+            db.execute('INSERT OR REPLACE INTO bucket VALUES (?, ?, ?, ?, ?)',
+                       (limit, key, tokens, now, full_at))
+            if not row:
+                # New keys are where the table grows; drop refilled buckets at the same time
+                db.execute('DELETE FROM bucket WHERE full_at <= ?', (now,))
+            db.execute('COMMIT')
+        return wait
+
+    def count(self, limit, outcome):
+        with self._connect() as db:
+            db.execute('INSERT INTO counter VALUES (?, ?, 1) '
+                       'ON CONFLICT (name, outcome) DO UPDATE SET n = n + 1', (limit, outcome))
+
+    def counters(self):
+        with self._connect() as db:
+            return {(name, outcome): n for name, outcome, n in db.execute('SELECT name, outcome, n FROM counter')}
+
+    def __len__(self):
+        with self._connect() as db:
+            return db.execute('SELECT COUNT(*) FROM bucket').fetchone()[0]
+
+
+class _Closing:
+    """sqlite3 connections only commit on `with`; this one closes too"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.db.in_transaction:
+            self.db.execute('ROLLBACK')
+        self.db.close()
+
+
+class RateLimiter:
+    """Flask extension holding the bucket backend, the configured limits and a throttle() check for views"""
+
+    def __init__(self, app=None):
+        self.backend = NullBuckets()
+        self.limits = dict(DEFAULT_LIMITS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RATELIMIT_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryBuckets(max_entries=app.config.get('RATELIMIT_MAX_ENTRIES', 10000))
+        elif backend == 'sqlite':
+            self.backend = SQLiteBuckets(
+                app.config.get('RATELIMIT_DB') or os.path.join(app.instance_path, 'ratelimit.sqlite')
+            )
+        else:
+            self.backend = NullBuckets()
+        self.limits = {**DEFAULT_LIMITS, **app.config.get('RATELIMIT_LIMITS', {})}
+        app.extensions['rate_limiter'] = self
+
+    def throttle(self, *checks):
+        """None if every (limit, key) bucket had a token, else a 429 response for the first empty one"""
+        for limit, key in checks:
+            burst, per_seconds = self.limits[limit]
+            wait = self.backend.take(limit, (key or '').strip().lower(), burst, per_seconds)
+            if wait:
+                self.backend.count(limit, 'limited')
+                retry_after = max(int(wait + 0.999), 1)
+                return (render_template('errors/429.html', retry_after=retry_after), 429,
+                        {'Retry-After': str(retry_after)})
+            self.backend.count(limit, 'allowed')
+        return None
+
+    def stats(self):
+        limits = {}
+        for (limit, outcome), n in self.backend.counters().items():
+            limits.setdefault(limit, {'allowed': 0, 'limited': 0})[outcome] = n
+        return {
+            'backend': type(self.backend).__name__,
+            'buckets': len(self.backend),
+            'limits': {
+                name: {'burst': burst, 'per_seconds': per_seconds,
+                       **limits.get(name, {'allowed': 0, 'limited': 0})}
+                for name, (burst, per_seconds) in self.limits.items()
+            }
+        }
+
+
+def client_ip():
+    """Address the limits key on (the forwarded client address when PROXY_FIX_HOPS is set)"""
+    return request.remote_addr or 'unknown'
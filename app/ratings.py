@@ -0,0 +1,34 @@
+"""Multiplayer Elo used for player and deck ratings.
+
+A pod is scored as every pairwise duel between its seats: finishing
+above someone is a win against them, the same finish a draw. K is split
+over the n - 1 duels, so one pod moves a rating about as far as one
+head-to-head game would. The work per session grows only with pod size.
+
+Pure functions; the tables and replay logic live in app/models.py.
+"""
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+
+def expected_score(rating, opponent_rating):
+    """Chance that `rating` beats `opponent_rating` under Elo's logistic curve"""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def pod_deltas(ratings, finishes, k=K_FACTOR):
+    """Rating change for each seat; ratings and finishes are parallel, lower finish is better"""
+    seats = len(ratings)
+    if seats < 2:
+        return [0.0] * seats
+    scale = k / (seats - 1)
+    deltas = []
+    for i in range(seats):
+        score = 0.0
+        for j in range(seats):
+            if i == j:
+                continue
+            actual = 1.0 if finishes[i] < finishes[j] else 0.5 if finishes[i] == finishes[j] else 0.0
+            score += actual - expected_score(ratings[i], ratings[j])
+        deltas.append(scale * score)
+    return deltas
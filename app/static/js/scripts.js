@@ -34,6 +34,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 headerWordWrap:true
             },
             {title: "Owner", field: "deck_owner", sorter: "string", width: 150,resizable:false},
+            {title: "Rating", field: "rating", sorter: "number", responsive:2, resizable:false},
             { 
                 title: "Win Rate", 
                 field: "win_rate", 
@@ -57,7 +58,11 @@ document.addEventListener('DOMContentLoaded', () => {
             ajaxURL: "/api/decks",
             layout: "fitDataFill",
             responsiveLayout: "collapse",
-            pagination: "local",
+            // Remote mode: page/size/sort[]/filter[] are sent to the API and applied in SQL
+            pagination: true,
+            paginationMode: "remote",
+            sortMode: "remote",
+            filterMode: "remote",
             paginationSize: 25,
             paginationSizeSelector: [10, 25, 50, 100],
             rowHeight: 60,
@@ -77,6 +82,7 @@ document.addEventListener('DOMContentLoaded', () => {
             {title: "Player", field: "player_name", sorter: "string", responsive:0,resizable:false},
             {title: "Wins", field: "wins", sorter: "number", responsive:0,resizable:false},
             {title: "Total Games", field: "total_games", sorter: "number", responsive:2,resizable:false, headerWordWrap:true},
+            {title: "Rating", field: "rating", sorter: "number", responsive:2, resizable:false},
             { 
                 title: "Win Rate", 
                 field: "win_rate", 
@@ -96,11 +102,68 @@ document.addEventListener('DOMContentLoaded', () => {
             ajaxURL: "/api/players",
             layout: "fitColumns",
             responsiveLayout: "collapse",
-            pagination: "local",
+            // Remote mode: page/size/sort[]/filter[] are sent to the API and applied in SQL
+            pagination: true,
+            paginationMode: "remote",
+            sortMode: "remote",
+            filterMode: "remote",
             paginationSize: 25,
             paginationSizeSelector: [10, 25, 50, 100],
             rowHeight: 60,
             columns: columns
         });
     }
-});
\ No newline at end of file
+
+    // Game entry lookups: selects marked data-lookup="players"/"decks" get a search box and
+    // are filled from /api/search/* as you type instead of rendering every row up front
+    function fillLookup(select, items) {
+        const selected = select.value;
+        const current = select.selectedOptions[0];
+        select.innerHTML = '';
+        select.appendChild(new Option(select.dataset.placeholder, 0));
+        if (current && current.value !== '0' && !items.some(item => String(item.id) === selected)) {
+            select.appendChild(new Option(current.text, current.value));
+        }
+        items.forEach(item => select.appendChild(new Option(item.name, item.id)));
+        select.value = selected;
+    }
+
+    function runLookup(select, query) {
+        const params = new URLSearchParams({q: query});
+        if (select.dataset.lookup === 'decks') {
+            // Only the row player's decks
+            const playerSelect = select.closest('tr').querySelector('select[name$="-player_id"]');
+            if (playerSelect && playerSelect.value !== '0') params.set('owner_id', playerSelect.value);
+        }
+        return fetch(`/api/search/${select.dataset.lookup}?${params}`)
+            .then(response => response.json())
+            .then(items => fillLookup(select, items))
+            .catch(err => console.error('Lookup failed:', err));
+    }
+
+    document.querySelectorAll('select[data-lookup]').forEach(select => {
+        select.dataset.placeholder = select.options.length ? select.options[0].text : '';
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control form-control-sm mb-1';
+        search.placeholder = 'Search...';
+        select.before(search);
+
+        let timer;
+        search.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => runLookup(select, search.value.trim()), 200);
+        });
+        // Most recently used entries before anything is typed
+        select.addEventListener('focus', () => runLookup(select, search.value.trim()), {once: true});
+
+        if (select.name.endsWith('-player_id')) {
+            select.addEventListener('change', () => {
+                const deckSelect = select.closest('tr').querySelector('select[data-lookup="decks"]');
+                if (!deckSelect) return;
+                deckSelect.value = 0;
+                if (select.value !== '0') runLookup(deckSelect, '');
+            });
+        }
+    });
+});
@@ -0,0 +1,35 @@
+"""add game_session.player_count
+
+Revision ID: 3c1f9a7d2b84
+Revises: 864430e5a06b
+Create Date: 2025-12-02 19:12:44.581203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d2b84'
+down_revision = '864430e5a06b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('player_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_game_session_player_count'), ['player_count'], unique=False)
+
+    # Backfill from existing results
+    op.execute(
+        "UPDATE game_session SET player_count = ("
+        "SELECT COUNT(game_result.id) FROM game_result "
+        "WHERE game_result.gr_session_id = game_session.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('game_session', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_game_session_player_count'))
+        batch_op.drop_column('player_count')
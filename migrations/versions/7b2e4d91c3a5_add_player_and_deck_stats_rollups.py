@@ -0,0 +1,74 @@
+"""add player_stats and deck_stats rollups
+
+Revision ID: 7b2e4d91c3a5
+Revises: 3c1f9a7d2b84
+Create Date: 2025-12-03 21:40:08.114529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4d91c3a5'
+down_revision = '3c1f9a7d2b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('player_stats',
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False),
+    sa.Column('valid_games', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('eliminations_dealt', sa.Integer(), nullable=False),
+    sa.Column('eliminations_received', sa.Integer(), nullable=False),
+    sa.Column('last_played', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['player_id'], ['player.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('player_id')
+    )
+    op.create_table('deck_stats',
+    sa.Column('deck_id', sa.Integer(), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False),
+    sa.Column('valid_games', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('eliminations_dealt', sa.Integer(), nullable=False),
+    sa.Column('eliminations_received', sa.Integer(), nullable=False),
+    sa.Column('last_played', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['deck_id'], ['deck.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('deck_id')
+    )
+
+    # Backfill (same aggregates as `flask stats rebuild`)
+    op.execute(
+        "INSERT INTO player_stats (player_id, games, valid_games, wins, eliminations_dealt, "
+        "eliminations_received, last_played) "
+        "SELECT player.id, COUNT(r.id), "
+        "COUNT(CASE WHEN s.player_count >= 4 THEN r.id END), "
+        "COUNT(CASE WHEN s.player_count >= 4 AND r.finish = 1 THEN r.id END), "
+        "(SELECT COUNT(v.id) FROM game_result v WHERE v.eliminated_by_id = player.id), "
+        "COUNT(r.eliminated_by_id), MAX(s.game_date) "
+        "FROM player LEFT OUTER JOIN game_result r ON r.player_id = player.id "
+        "LEFT OUTER JOIN game_session s ON s.id = r.gr_session_id "
+        "GROUP BY player.id"
+    )
+    op.execute(
+        "INSERT INTO deck_stats (deck_id, games, valid_games, wins, eliminations_dealt, "
+        "eliminations_received, last_played) "
+        "SELECT deck.id, COUNT(r.id), "
+        "COUNT(CASE WHEN s.player_count >= 4 THEN r.id END), "
+        "COUNT(CASE WHEN s.player_count >= 4 AND r.finish = 1 THEN r.id END), "
+        "(SELECT COUNT(v.id) FROM game_result p JOIN game_result v "
+        "ON v.gr_session_id = p.gr_session_id AND v.eliminated_by_id = p.player_id "
+        "WHERE p.deck_id = deck.id), "
+        "COUNT(r.eliminated_by_id), MAX(s.game_date) "
+        "FROM deck LEFT OUTER JOIN game_result r ON r.deck_id = deck.id "
+        "LEFT OUTER JOIN game_session s ON s.id = r.gr_session_id "
+        "GROUP BY deck.id"
+    )
+
+
+def downgrade():
+    op.drop_table('deck_stats')
+    op.drop_table('player_stats')
@@ -0,0 +1,29 @@
+"""add data_version counter
+
+Revision ID: a4d8e2f6b913
+Revises: 7b2e4d91c3a5
+Create Date: 2025-12-05 18:03:51.902217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e2f6b913'
+down_revision = '7b2e4d91c3a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO data_version (id, version) VALUES (1, 1)")
+
+
+def downgrade():
+    op.drop_table('data_version')
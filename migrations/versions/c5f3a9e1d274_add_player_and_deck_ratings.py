@@ -0,0 +1,99 @@
+"""add player/deck ratings and rating history
+
+Revision ID: c5f3a9e1d274
+Revises: a4d8e2f6b913
+Create Date: 2025-12-06 14:22:37.418305
+
+"""
+from itertools import groupby
+from alembic import op
+import sqlalchemy as sa
+from app.ratings import INITIAL_RATING, pod_deltas
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f3a9e1d274'
+down_revision = 'a4d8e2f6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    player_rating = op.create_table('player_rating',
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.Float(), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['player.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('player_id')
+    )
+    deck_rating = op.create_table('deck_rating',
+    sa.Column('deck_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.Float(), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['deck_id'], ['deck.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('deck_id')
+    )
+    rating_history = op.create_table('rating_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('game_date', sa.Date(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('deck_id', sa.Integer(), nullable=False),
+    sa.Column('finish', sa.Integer(), nullable=False),
+    sa.Column('player_rating_before', sa.Float(), nullable=False),
+    sa.Column('player_rating_after', sa.Float(), nullable=False),
+    sa.Column('deck_rating_before', sa.Float(), nullable=False),
+    sa.Column('deck_rating_after', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['deck_id'], ['deck.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['player_id'], ['player.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('rating_history', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rating_history_session_id'), ['session_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_rating_history_player_id'), ['player_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_rating_history_deck_id'), ['deck_id'], unique=False)
+        batch_op.create_index('ix_rating_history_game_date_session_id', ['game_date', 'session_id'], unique=False)
+
+    # Backfill by rating every session in date order (same as `flask stats rebuild`)
+    seats = op.get_bind().execute(sa.text(
+        "SELECT s.id, s.game_date, r.player_id, r.deck_id, r.finish "
+        "FROM game_session s JOIN game_result r ON r.gr_session_id = s.id "
+        "ORDER BY s.game_date, s.id, r.finish"
+    ).columns(game_date=sa.Date))
+    players, decks, history = {}, {}, []
+    for _, pod in groupby(seats, key=lambda seat: seat.id):
+        pod = list(pod)
+        if len(pod) < 2:
+            continue
+        finishes = [seat.finish for seat in pod]
+        player_before = [players.get(seat.player_id, (INITIAL_RATING, 0))[0] for seat in pod]
+        deck_before = [decks.get(seat.deck_id, (INITIAL_RATING, 0))[0] for seat in pod]
+        for seat, p_before, p_delta, d_before, d_delta in zip(
+                pod, player_before, pod_deltas(player_before, finishes),
+                deck_before, pod_deltas(deck_before, finishes)):
+            players[seat.player_id] = (p_before + p_delta, players.get(seat.player_id, (0, 0))[1] + 1)
+            decks[seat.deck_id] = (d_before + d_delta, decks.get(seat.deck_id, (0, 0))[1] + 1)
+            history.append({
+                'session_id': seat.id, 'game_date': seat.game_date, 'player_id': seat.player_id,
+                'deck_id': seat.deck_id, 'finish': seat.finish,
+                'player_rating_before': p_before, 'player_rating_after': p_before + p_delta,
+                'deck_rating_before': d_before, 'deck_rating_after': d_before + d_delta,
+            })
+    if history:
+        op.bulk_insert(rating_history, history)
+        op.bulk_insert(player_rating, [{'player_id': id, 'rating': rating, 'games': games}
+                                       for id, (rating, games) in players.items()])
+        op.bulk_insert(deck_rating, [{'deck_id': id, 'rating': rating, 'games': games}
+                                     for id, (rating, games) in decks.items()])
+
+
+def downgrade():
+    with op.batch_alter_table('rating_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_rating_history_game_date_session_id')
+        batch_op.drop_index(batch_op.f('ix_rating_history_deck_id'))
+        batch_op.drop_index(batch_op.f('ix_rating_history_player_id'))
+        batch_op.drop_index(batch_op.f('ix_rating_history_session_id'))
+
+    op.drop_table('rating_history')
+    op.drop_table('deck_rating')
+    op.drop_table('player_rating')
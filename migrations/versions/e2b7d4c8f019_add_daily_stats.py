@@ -0,0 +1,71 @@
+"""add daily_stats time series buckets
+
+Revision ID: e2b7d4c8f019
+Revises: c5f3a9e1d274
+Create Date: 2025-12-07 10:41:12.503817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d4c8f019'
+down_revision = 'c5f3a9e1d274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    daily_stats = op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('key', sa.String(length=20), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False),
+    sa.Column('valid_games', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'dimension', 'key')
+    )
+    with op.batch_alter_table('daily_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_stats_dimension_key_day', ['dimension', 'key', 'day'], unique=False)
+
+    # Backfill (same aggregates as `flask stats rebuild`), built with Core so
+    # the reserved word `key` is quoted and the casts compile on every backend
+    session = sa.table('game_session', sa.column('id'), sa.column('game_date'), sa.column('player_count'))
+    result = sa.table('game_result', sa.column('id'), sa.column('gr_session_id'), sa.column('player_id'),
+                      sa.column('deck_id'), sa.column('finish'))
+    deck = sa.table('deck', sa.column('id'), sa.column('color_identity_code'))
+    valid = session.c.player_count >= 4
+    columns = ['day', 'dimension', 'key', 'games', 'valid_games', 'wins']
+
+    league = (
+        sa.select(session.c.game_date, sa.literal('league'), sa.literal(''),
+                  sa.func.count(session.c.id), sa.func.count(sa.case((valid, session.c.id))), sa.literal(0))
+        .where(session.c.player_count > 0)
+        .group_by(session.c.game_date)
+    )
+    results = session.join(result, result.c.gr_session_id == session.c.id).join(deck, deck.c.id == result.c.deck_id)
+    counts = [
+        sa.func.count(result.c.id),
+        sa.func.count(sa.case((valid, result.c.id))),
+        sa.func.count(sa.case((sa.and_(valid, result.c.finish == 1), result.c.id))),
+    ]
+    selects = [league]
+    for dimension, column in (('player', result.c.player_id),
+                              ('deck', result.c.deck_id),
+                              ('color', deck.c.color_identity_code)):
+        key = column if dimension == 'color' else sa.cast(column, sa.String(20))
+        selects.append(
+            sa.select(session.c.game_date, sa.literal(dimension), key, *counts)
+            .select_from(results)
+            .group_by(session.c.game_date, column)
+        )
+    for select in selects:
+        op.execute(daily_stats.insert().from_select(columns, select))
+
+
+def downgrade():
+    with op.batch_alter_table('daily_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_stats_dimension_key_day')
+
+    op.drop_table('daily_stats')
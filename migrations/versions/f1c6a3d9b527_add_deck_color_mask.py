@@ -0,0 +1,37 @@
+"""add deck.color_mask
+
+Revision ID: f1c6a3d9b527
+Revises: e2b7d4c8f019
+Create Date: 2025-12-08 18:27:05.114930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a3d9b527'
+down_revision = 'e2b7d4c8f019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('deck', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('color_mask', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_deck_color_mask'), ['color_mask'], unique=False)
+
+    # Backfill from existing deck_colors (W=1, U=2, B=4, R=8, G=16, C=32)
+    op.execute(
+        "UPDATE deck SET color_mask = COALESCE(("
+        "SELECT SUM(CASE deck_colors.color_id "
+        "WHEN 'W' THEN 1 WHEN 'U' THEN 2 WHEN 'B' THEN 4 "
+        "WHEN 'R' THEN 8 WHEN 'G' THEN 16 WHEN 'C' THEN 32 ELSE 0 END) "
+        "FROM deck_colors WHERE deck_colors.deck_id = deck.id), 0)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('deck', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_deck_color_mask'))
+        batch_op.drop_column('color_mask')
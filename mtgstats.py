@@ -1,7 +1,8 @@
 import sqlalchemy as sa
 import sqlalchemy.orm as so
 from app import create_app, db
-from app.models import User, Player, Deck, GameSession, GameResult, ColorIdentity
+from app.models import (User, Player, Deck, GameSession, GameResult, ColorIdentity, PlayerStats, DeckStats,
+                        PlayerRating, DeckRating, RatingHistory, DailyStats)
 from app.admin import (  # Import your admin views
     SecureModelView, UserAdmin, PlayerAdmin, DeckAdmin, 
     GameSessionAdmin, GameResultAdmin
@@ -22,6 +23,12 @@ def make_shell_context():
         'GameSession': GameSession, 
         'GameResult': GameResult, 
         'ColorIdentity': ColorIdentity,
+        'PlayerStats': PlayerStats,
+        'DeckStats': DeckStats,
+        'PlayerRating': PlayerRating,
+        'DeckRating': DeckRating,
+        'RatingHistory': RatingHistory,
+        'DailyStats': DailyStats,
         # Admin objects for testing
         'my_admin': my_admin,
         'SecureModelView': SecureModelView,
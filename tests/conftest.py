@@ -0,0 +1,107 @@
+import os
+import sys
+import types
+from contextlib import contextmanager
+import pytest
+import sqlalchemy as sa
+from flask import g
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import config  # noqa: F401  (deployment settings, not in the repo)
+except ImportError:
+    class Config:
+        SECRET_KEY = 'test'
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        MAIL_SERVER = None
+        MAIL_PORT = 25
+        MAIL_USE_TLS = False
+        MAIL_USERNAME = None
+        MAIL_PASSWORD = None
+        ADMINS = ['admin@example.com']
+
+    sys.modules['config'] = types.SimpleNamespace(Config=Config)
+
+from config import Config
+from app import create_app, db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory for apps on their own empty SQLite database, torn down after the test"""
+    contexts = []
+
+    def make(name=None, **config):
+        name = name or f'app{len(contexts)}'
+        class TestConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / f'{name}.db')
+            TESTING = True
+            WTF_CSRF_ENABLED = False
+            CACHE_BACKEND = 'null'
+            RATELIMIT_BACKEND = 'null'
+            SQL_INSTRUMENTATION = False
+            MAIL_SPOOL_DIR = str(tmp_path / f'{name}-mail')
+
+        for key, value in config.items():
+            setattr(TestConfig, key, value)
+        app = create_app(TestConfig)
+
+        @app.before_request
+        def forget_current_user():
+            # Requests reuse the app context pushed below, so g would carry
+            # Flask-Login's user from one request into the next
+            g.pop('_login_user', None)
+
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        db.create_all()
+        return app
+
+    yield make
+    for context in reversed(contexts):
+        db.session.remove()
+        db.drop_all()
+        context.pop()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@contextmanager
+def statements():
+    """Collect the SQL statements run inside the block"""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    sa.event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield seen
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def login(client, username='user', password='password', is_admin=False):
+    """Create a user and log the test client in as them"""
+    from app.models import User
+    user = User(username=username, email=f'{username}@example.com', is_admin=is_admin)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    response = client.post('/auth/login', data={'username': username, 'password': password})
+    assert response.status_code == 302
+    return user
+
+
+def statement_count(client, url):
+    """Statements run by one GET of url (asserting it succeeded)"""
+    db.session.remove()
+    with statements() as seen:
+        response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    return len(seen)
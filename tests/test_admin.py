@@ -0,0 +1,68 @@
+import sqlalchemy as sa
+from app import db
+from app.bench import seed_league
+from app.models import bump_data_version
+from conftest import login, statement_count
+
+ADMIN_LISTS = ('/admin/player/', '/admin/deck/', '/admin/gamesession/', '/admin/gameresult/',
+               '/admin/coloridentity/', '/admin/deckcolor/')
+
+
+def test_admin_views_on_second_app(make_app):
+    make_app(name='first')
+    app = make_app(name='second')
+    client = app.test_client()
+    login(client, is_admin=True)
+    for url in ('/admin/player/', '/admin/deck/', '/admin/deckcolor/'):
+        assert client.get(url).status_code == 200, url
+
+
+def test_admin_lists_statements_do_not_grow_with_league(make_app):
+    # The small league fits on a part-filled first page, so per-row queries show up as a difference
+    counts = {}
+    for size, league in (('small', dict(players=4, decks=4, games=4)),
+                         ('large', dict(players=40, decks=200, games=400))):
+        app = make_app()
+        seed_league(**league)
+        client = app.test_client()
+        login(client, is_admin=True)
+        counts[size] = [statement_count(client, url) for url in ADMIN_LISTS]
+    assert counts['small'] == counts['large']
+
+
+def test_custom_admin_views_need_admin(app):
+    client = app.test_client()
+    for url in ('/admin/game_import/', '/admin/game_export/'):
+        assert client.get(url).status_code == 302, url
+    login(client, is_admin=True)
+    for url in ('/admin/game_import/', '/admin/game_export/'):
+        assert client.get(url).status_code == 200, url
+
+
+def test_admin_edit_expires_cached_user(make_app):
+    app = make_app()
+    user_client, admin_client = app.test_client(), app.test_client()
+    user = login(user_client)
+    login(admin_client, username='admin', is_admin=True)
+    assert user_client.get('/api/cache/stats').status_code == 403  # Profile cached in the session
+
+    response = admin_client.post(f'/admin/user/edit/?id={user.id}',
+                                 data={'username': 'renamed', 'email': 'user@example.com', 'is_admin': 'y'})
+    assert response.status_code == 302
+    db.session.remove()  # Requests share the test's app context; start the next one with a fresh session
+    assert user_client.get('/api/cache/stats').status_code == 200
+
+
+def test_user_changed_by_another_worker_expires_cached_user(make_app):
+    app = make_app(USER_CACHE_TTL=3600)
+    client = app.test_client()
+    login(client)
+    assert client.get('/api/cache/stats').status_code == 403
+
+    # Another worker's commit: no session hook runs in this process
+    with db.engine.begin() as connection:
+        connection.execute(sa.text("UPDATE user SET is_admin = 1 WHERE username = 'user'"))
+        bump_data_version(connection)
+
+    db.session.remove()
+    assert client.get('/api/cache/stats').status_code == 200
@@ -0,0 +1,32 @@
+import sqlalchemy as sa
+from app import db
+from app.models import Player
+from conftest import login
+
+
+def test_memory_cache_follows_data_version_written_by_another_worker(make_app):
+    app = make_app(CACHE_BACKEND='memory')
+    client = app.test_client()
+    db.session.add(Player(player_name='Alice'))
+    db.session.commit()
+    assert [p['player_name'] for p in client.get('/api/players').json] == ['Alice']
+
+    # Another worker's commit: no after_commit hook runs in this process
+    with db.engine.begin() as connection:
+        connection.execute(sa.text("INSERT INTO player (player_name) VALUES ('Bob')"))
+        connection.execute(sa.text('UPDATE data_version SET version = version + 1'))
+
+    assert [p['player_name'] for p in client.get('/api/players').json] == ['Alice', 'Bob']
+
+
+def test_cache_stats_needs_admin(app):
+    client = app.test_client()
+    assert client.get('/api/cache/stats').status_code == 302
+    login(client)
+    assert client.get('/api/cache/stats').status_code == 403
+
+
+def test_cache_stats_for_admin(app):
+    client = app.test_client()
+    login(client, is_admin=True)
+    assert client.get('/api/cache/stats').json['backend'] == 'NullCache'
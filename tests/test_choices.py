@@ -0,0 +1,37 @@
+import sqlalchemy as sa
+from app import db
+from app.bench import seed_league
+from app.main.choices import player_choices
+from app.models import GameResult, Player
+from conftest import login, statements
+
+
+def test_choices_follow_data_version_written_by_another_worker(app):
+    db.session.add(Player(player_name='Alice'))
+    db.session.commit()
+    assert [name for _, name in player_choices()] == ['Alice']
+
+    # Another worker's commit: no session hook runs in this process
+    with db.engine.begin() as connection:
+        connection.execute(sa.text("INSERT INTO player (player_name) VALUES ('Bob')"))
+        connection.execute(sa.text('UPDATE data_version SET version = version + 1'))
+
+    assert [name for _, name in player_choices()] == ['Alice', 'Bob']
+
+
+def test_add_game_looks_up_only_submitted_ids(app):
+    seed_league(players=8, decks=8, games=0)
+    client = app.test_client()
+    login(client)
+    data = {'game_date': '2024-01-01', 'gs_wincon': 'Combat', 'comments': ''}
+    for i in range(4):
+        data[f'results-{i}-player_id'] = i + 1
+        data[f'results-{i}-deck_id'] = i + 1
+        data[f'results-{i}-finish'] = i + 1
+        data[f'results-{i}-eliminated_by_id'] = 1 if i else 0
+    with statements() as seen:
+        response = client.post('/add_game', data=data)
+    assert response.status_code == 302
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(GameResult)) == 4
+    lookups = [s for s in seen if s.startswith('SELECT') and ('player.player_name' in s or 'deck.deck_name' in s)]
+    assert len(lookups) == 2 and all(' IN (' in s for s in lookups), lookups
@@ -0,0 +1,40 @@
+import os
+import stat
+import time
+from app import mail_queue
+from app.email import send_email
+from conftest import login
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_spool_is_private(make_app, tmp_path):
+    spool = tmp_path / 'spool'
+    spool.mkdir(mode=0o755)
+    make_app(MAIL_SPOOL_DIR=str(spool), MAIL_WORKERS=0)
+    send_email('Reset Your Password', 'no-reply@example.com', ['user@example.com'], 'token', '<p>token</p>')
+    [name] = os.listdir(spool)
+    assert mode(spool) == 0o700
+    assert mode(spool / name) == 0o600
+
+
+def test_old_failed_messages_are_purged(make_app, tmp_path):
+    spool = tmp_path / 'spool'
+    make_app(MAIL_SPOOL_DIR=str(spool), MAIL_WORKERS=0, MAIL_FAILED_RETENTION=3600)
+    old, recent = spool / '1-old.failed', spool / '2-recent.failed'
+    old.write_text('{}')
+    recent.write_text('{}')
+    os.utime(old, (time.time() - 7200,) * 2)
+    assert mail_queue._claim() == []
+    assert sorted(os.listdir(spool)) == ['2-recent.failed']
+
+
+def test_mail_stats_needs_admin(app):
+    client = app.test_client()
+    login(client)
+    assert client.get('/api/mail/stats').status_code == 403
+    client.get('/auth/logout')
+    login(client, username='admin', is_admin=True)
+    assert client.get('/api/mail/stats').json['queued'] == 0
@@ -0,0 +1,80 @@
+import io
+from datetime import date
+import pytest
+import sqlalchemy as sa
+from app import db
+from app.bench import seed_league
+from app.importer import ImportAborted, import_games, read_rows
+from app.models import GameSession, GameResult
+from conftest import login
+
+SPLIT_SESSION = (
+    'A,2024-01-01,Player 0001,Deck 00001,1',
+    'A,2024-01-01,Player 0002,Deck 00002,2',
+    'B,2024-01-02,Player 0003,Deck 00003,1',
+    'B,2024-01-02,Player 0004,Deck 00004,2',
+    'A,2024-01-01,Player 0003,Deck 00003,3',
+)
+
+
+def csv_rows(*lines):
+    text = 'session,game_date,player,deck,finish\n' + ''.join(line + '\n' for line in lines)
+    return read_rows(io.BytesIO(text.encode()), 'games.csv')
+
+
+def test_session_split_by_another_session_is_skipped(app):
+    seed_league(players=4, decks=4, games=0)
+    report = import_games(csv_rows(*SPLIT_SESSION))
+    assert report.errors == [(6, 'session "A" continues after other sessions; keep its rows together')]
+    assert (report.sessions, report.results, report.skipped_sessions) == (1, 2, 1)
+    assert db.session.scalars(sa.select(GameSession.game_date)).all() == [date(2024, 1, 2)]
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(GameResult)) == 2
+
+
+def test_split_session_after_its_chunk_is_reported(app):
+    seed_league(players=4, decks=4, games=0)
+    report = import_games(csv_rows(*SPLIT_SESSION), chunk_size=1)
+    [(row_number, message)] = report.errors
+    assert row_number == 6 and 'previous chunk' in message
+    # The later row never becomes a session of its own
+    assert db.session.scalars(sa.select(GameSession.game_date).order_by(GameSession.id)).all() == [
+        date(2024, 1, 1), date(2024, 1, 2)]
+
+
+def fail_on_chunk(monkeypatch, failing_chunk):
+    """Make the commit of the given chunk (1-based) raise an IntegrityError"""
+    import app.importer
+    calls = []
+    bump = app.importer.bump_data_version
+
+    def bump_or_fail(connection):
+        calls.append(connection)
+        if len(calls) == failing_chunk:
+            raise sa.exc.IntegrityError('INSERT INTO game_result', {}, Exception('constraint failed'))
+        bump(connection)
+    monkeypatch.setattr(app.importer, 'bump_data_version', bump_or_fail)
+
+
+def test_database_error_reports_committed_chunks(app, monkeypatch):
+    seed_league(players=4, decks=4, games=0)
+    fail_on_chunk(monkeypatch, 2)
+    with pytest.raises(ImportAborted) as aborted:
+        import_games(csv_rows('A,2024-01-01,Player 0001,Deck 00001,1',
+                              'B,2024-01-02,Player 0002,Deck 00002,1'), chunk_size=1)
+    assert (aborted.value.report.sessions, aborted.value.report.results) == (1, 1)
+    # The failed chunk was rolled back and the session is usable again
+    assert db.session.scalars(sa.select(GameSession.game_date)).all() == [date(2024, 1, 1)]
+
+
+def test_admin_import_database_error(app, monkeypatch):
+    seed_league(players=4, decks=4, games=0)
+    client = app.test_client()
+    login(client, is_admin=True)
+    fail_on_chunk(monkeypatch, 1)
+    response = client.post('/admin/game_import/', data={
+        'file': (io.BytesIO(b'session,game_date,player,deck,finish\nA,2024-01-01,Player 0001,Deck 00001,1\n'),
+                 'games.csv')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert b'database error' in response.data and b'0 sessions' in response.data
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(GameSession)) == 0
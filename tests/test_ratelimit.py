@@ -0,0 +1,65 @@
+from app.ratelimit import MemoryBuckets
+from conftest import login, statements
+
+
+def test_ratelimit_stats_needs_admin(app):
+    client = app.test_client()
+    login(client)
+    assert client.get('/api/ratelimit/stats').status_code == 403
+    client.get('/auth/logout')
+    login(client, username='admin', is_admin=True)
+    assert client.get('/api/ratelimit/stats').json['backend'] == 'NullBuckets'
+
+
+def test_memory_buckets_evict_least_recently_used():
+    buckets = MemoryBuckets(max_entries=3)
+    for ip in ('a', 'b', 'c'):
+        assert buckets.take('login_ip', ip, 1, 60) == 0
+    assert buckets.take('login_ip', 'a', 1, 60) > 0  # a is now the most recent
+    assert buckets.take('login_ip', 'd', 1, 60) == 0
+    assert len(buckets) == 3
+    assert buckets.take('login_ip', 'b', 1, 60) == 0  # b was evicted, so it starts full
+    assert buckets.take('login_ip', 'a', 1, 60) > 0
+
+
+def login_statuses(app, *forwarded_for):
+    client = app.test_client()
+    return [client.post('/auth/login', data={'username': 'nobody', 'password': 'wrong'},
+                        headers={'X-Forwarded-For': ip}).status_code
+            for ip in forwarded_for]
+
+
+def test_ip_limit_keys_on_forwarded_address_behind_proxy(make_app):
+    limits = {'login_ip': (1, 60), 'login_user': (100, 60)}
+    app = make_app(RATELIMIT_BACKEND='memory', RATELIMIT_LIMITS=limits, PROXY_FIX_HOPS=1)
+    assert login_statuses(app, '203.0.113.1', '203.0.113.2', '203.0.113.1') == [302, 302, 429]
+
+
+def test_ip_limit_ignores_forwarded_header_by_default(make_app):
+    limits = {'login_ip': (1, 60), 'login_user': (100, 60)}
+    app = make_app(RATELIMIT_BACKEND='memory', RATELIMIT_LIMITS=limits)
+    assert login_statuses(app, '203.0.113.1', '203.0.113.2') == [302, 429]
+
+
+def test_auth_routes_answer_429_with_retry_after(make_app):
+    app = make_app(RATELIMIT_BACKEND='memory', RATELIMIT_LIMITS={'login_user': (1, 300), 'reset_email': (1, 3600)})
+    client = app.test_client()
+    for url, data in (('/auth/login', {'username': 'alice', 'password': 'wrong'}),
+                      ('/auth/reset_password_request', {'email': 'alice@example.com'})):
+        client.post(url, data=data)
+        response = client.post(url, data=data)
+        assert response.status_code == 429, url
+        assert 1 <= int(response.headers['Retry-After']) <= 3600, url
+        assert b'Too Many Attempts' in response.data
+
+
+def test_throttle_is_charged_before_form_validation(make_app):
+    app = make_app(RATELIMIT_BACKEND='memory', RATELIMIT_LIMITS={'login_ip': (1, 60)})
+    client = app.test_client()
+    # An invalid form (no password) still takes the token...
+    assert client.post('/auth/login', data={'username': 'alice'}).status_code == 200
+    # ...and a refused request never reaches the user lookup
+    with statements() as seen:
+        response = client.post('/auth/login', data={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 429
+    assert not any('FROM user' in statement for statement in seen)
@@ -0,0 +1,171 @@
+from datetime import date
+import sqlalchemy as sa
+from app import db, models
+from app.bench import seed_league
+from app.models import (Deck, DeckColor, DeckRating, DeckStats, GameResult, GameSession, PlayerRating,
+                        PlayerStats, RatingHistory, refresh_color_masks, refresh_deck_stats,
+                        refresh_player_stats, replay_ratings, update_player_counts)
+from conftest import login, statement_count
+
+
+def league_statements(make_app, url, **league):
+    app = make_app()
+    seed_league(**league)
+    with app.app_context():
+        return statement_count(app.test_client(), url)
+
+
+def test_api_decks_statements_do_not_grow_with_decks(make_app):
+    small = league_statements(make_app, '/api/decks', players=10, decks=20, games=40)
+    large = league_statements(make_app, '/api/decks', players=10, decks=200, games=400)
+    assert small == large
+
+
+def test_stats_pages_statements_do_not_grow_with_league(make_app):
+    for url in ('/players', '/decks'):
+        small = league_statements(make_app, url, players=10, decks=20, games=40)
+        large = league_statements(make_app, url, players=100, decks=200, games=400)
+        assert small == large, url
+
+
+def derived_columns():
+    """Every column the flush hooks maintain, in a comparable form"""
+    def rows(select):
+        return [tuple(row) for row in db.session.execute(select)]
+    return {
+        'player_stats': rows(sa.select(PlayerStats.__table__).order_by(PlayerStats.player_id)),
+        'deck_stats': rows(sa.select(DeckStats.__table__).order_by(DeckStats.deck_id)),
+        'player_count': rows(sa.select(GameSession.id, GameSession.player_count).order_by(GameSession.id)),
+        'color_mask': rows(sa.select(Deck.id, Deck.color_mask).order_by(Deck.id)),
+    }
+
+
+def assert_matches_rebuild():
+    """Compare the hook-maintained columns with a full rebuild, then roll the rebuild back"""
+    incremental = derived_columns()
+    connection = db.session.connection()
+    update_player_counts(connection, db.session.scalars(sa.select(GameSession.id)).all())
+    refresh_player_stats(connection)
+    refresh_deck_stats(connection)
+    refresh_color_masks(connection)
+    assert derived_columns() == incremental
+    db.session.rollback()
+
+
+def test_rollups_match_full_rebuild_after_edits(app):
+    seed_league(players=8, decks=12, games=30)
+    assert_matches_rebuild()
+
+    # Add a three-player game, then make it a valid four-player one
+    game = GameSession(game_date=date(2020, 1, 5), gs_wincon='Combat')
+    game.results = [GameResult(player_id=player_id, deck_id=player_id, finish=finish,
+                               eliminated_by_id=1 if finish > 1 else None)
+                    for finish, player_id in enumerate((1, 2, 3), start=1)]
+    db.session.add(game)
+    db.session.commit()
+    assert_matches_rebuild()
+    game.results.append(GameResult(player_id=4, deck_id=4, finish=4, eliminated_by_id=2))
+    db.session.commit()
+    assert_matches_rebuild()
+
+    # Edit: new finish, deck and eliminator, a result moved to another session, a moved date
+    first, second = db.session.get(GameSession, 1), db.session.get(GameSession, 2)
+    result = first.results[0]
+    result.finish, result.deck_id, result.eliminated_by_id = 4, 12, game.results[0].player_id
+    first.results[1].gr_session = second
+    second.game_date = date(2021, 6, 1)
+    db.session.commit()
+    assert_matches_rebuild()
+
+    # Delete a result and a whole session
+    db.session.delete(db.session.get(GameSession, 3).results[0])
+    db.session.delete(db.session.get(GameSession, 4))
+    db.session.commit()
+    assert_matches_rebuild()
+
+    # Deck colours feed color_mask
+    deck = db.session.get(Deck, 1)
+    deck.deck_colors.append(DeckColor(color_id='C'))
+    db.session.delete(db.session.get(Deck, 2).deck_colors[0])
+    db.session.commit()
+    assert_matches_rebuild()
+
+
+def test_edit_without_stat_changes_refreshes_nothing(app, monkeypatch):
+    seed_league(players=8, decks=12, games=10)
+    client = app.test_client()
+    login(client)
+    game = db.session.get(GameSession, 5)
+    data = {'game_date': game.game_date.isoformat(), 'gs_wincon': 'Edited', 'comments': 'Only the comment changed'}
+    for i, result in enumerate(sorted(game.results, key=lambda r: r.finish)):
+        data[f'results-{i}-player_id'] = result.player_id
+        data[f'results-{i}-deck_id'] = result.deck_id
+        data[f'results-{i}-finish'] = result.finish
+        data[f'results-{i}-eliminated_by_id'] = result.eliminated_by_id or 0
+    refreshed = []
+    monkeypatch.setattr(models, 'refresh_derived_stats', lambda *args, **kwargs: refreshed.append(args))
+
+    assert client.post('/game_session/edit/5', data=data).status_code == 302
+    assert db.session.get(GameSession, 5).comments == 'Only the comment changed'
+    assert refreshed == []
+
+    data['game_date'] = '2019-12-31'
+    client.post('/game_session/edit/5', data=data)
+    assert len(refreshed) == 1
+
+
+def ratings():
+    """player_rating, deck_rating and rating_history (without row ids) in a comparable form"""
+    history = RatingHistory.__table__
+    return {
+        'player_rating': db.session.execute(sa.select(PlayerRating.__table__).order_by(PlayerRating.player_id)).all(),
+        'deck_rating': db.session.execute(sa.select(DeckRating.__table__).order_by(DeckRating.deck_id)).all(),
+        'rating_history': db.session.execute(
+            sa.select(*(column for column in history.c if column.key != 'id'))
+            .order_by(history.c.game_date, history.c.session_id, history.c.finish)
+        ).all(),
+    }
+
+
+def assert_ratings_match_replay():
+    """Compare the incrementally updated ratings with a full replay, then roll the replay back"""
+    incremental = ratings()
+    replay_ratings(db.session.connection())
+    assert ratings() == incremental
+    db.session.rollback()
+
+
+def test_incremental_ratings_match_full_replay(app):
+    seed_league(players=8, decks=12, games=30)
+    assert_ratings_match_replay()
+
+    # A new game in the middle of the history replays everything after it
+    game = GameSession(game_date=date(2020, 1, 5))
+    game.results = [GameResult(player_id=player_id, deck_id=player_id, finish=finish)
+                    for finish, player_id in enumerate((5, 6, 7, 8), start=1)]
+    db.session.add(game)
+    db.session.commit()
+    assert_ratings_match_replay()
+
+    # Edit finishes and a deck in an old game
+    results = sorted(db.session.get(GameSession, 3).results, key=lambda r: r.finish)
+    results[0].finish, results[-1].finish = results[-1].finish, results[0].finish
+    results[1].deck_id = 12
+    db.session.commit()
+    assert_ratings_match_replay()
+
+    # Move a game earlier, then another one later
+    db.session.get(GameSession, 20).game_date = date(2019, 12, 1)
+    db.session.commit()
+    assert_ratings_match_replay()
+    db.session.get(GameSession, 2).game_date = date(2020, 3, 1)
+    db.session.commit()
+    assert_ratings_match_replay()
+
+    # Delete a seat, then a whole game
+    db.session.delete(db.session.get(GameSession, 7).results[0])
+    db.session.commit()
+    assert_ratings_match_replay()
+    db.session.delete(db.session.get(GameSession, 10))
+    db.session.commit()
+    assert_ratings_match_replay()